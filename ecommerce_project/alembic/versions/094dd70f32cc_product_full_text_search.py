@@ -0,0 +1,68 @@
+"""product full text search
+
+Revision ID: 094dd70f32cc
+Revises: f89283f2b2ae
+Create Date: 2026-10-17 12:48:55.170342
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '094dd70f32cc'
+down_revision: Union[str, None] = 'f89283f2b2ae'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('products', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+    op.create_index('ix_products_search_vector', 'products', ['search_vector'], unique=False, postgresql_using='gin')
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION products_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector :=
+                setweight(to_tsvector('english', coalesce(NEW.product_name, '')), 'A') ||
+                setweight(to_tsvector('english', coalesce(NEW.brand, '')), 'A') ||
+                setweight(to_tsvector('english', coalesce(
+                    (SELECT category_name FROM categories WHERE id = NEW.category_id), '')), 'B') ||
+                setweight(to_tsvector('english', coalesce(NEW.description, '')), 'C');
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql;
+    """)
+    op.execute("""
+        CREATE TRIGGER products_search_vector_trigger
+            BEFORE INSERT OR UPDATE OF product_name, brand, description, category_id ON products
+            FOR EACH ROW EXECUTE FUNCTION products_search_vector_update();
+    """)
+    op.execute("""
+        CREATE OR REPLACE FUNCTION categories_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            UPDATE products SET category_id = category_id WHERE category_id = NEW.id;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql;
+    """)
+    op.execute("""
+        CREATE TRIGGER categories_search_vector_trigger
+            AFTER UPDATE OF category_name ON categories
+            FOR EACH ROW WHEN (OLD.category_name IS DISTINCT FROM NEW.category_name)
+            EXECUTE FUNCTION categories_search_vector_update();
+    """)
+
+    # Backfill: touching the column fires the trigger for every existing row
+    op.execute("UPDATE products SET product_name = product_name")
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS categories_search_vector_trigger ON categories")
+    op.execute("DROP FUNCTION IF EXISTS categories_search_vector_update()")
+    op.execute("DROP TRIGGER IF EXISTS products_search_vector_trigger ON products")
+    op.execute("DROP FUNCTION IF EXISTS products_search_vector_update()")
+    op.drop_index('ix_products_search_vector', table_name='products')
+    op.drop_column('products', 'search_vector')
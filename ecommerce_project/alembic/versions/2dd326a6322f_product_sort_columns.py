@@ -0,0 +1,66 @@
+"""product sort columns
+
+Revision ID: 2dd326a6322f
+Revises: 96911b22ead8
+Create Date: 2026-10-17 15:02:27.561930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2dd326a6322f'
+down_revision: Union[str, None] = '96911b22ead8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('products', sa.Column('min_effective_price', sa.Float(), nullable=True))
+    op.add_column('products', sa.Column('max_effective_price', sa.Float(), nullable=True))
+    op.add_column('products', sa.Column('units_sold', sa.Integer(), server_default=sa.text('0'), nullable=False))
+
+    # Backfill: price after discount over each product's variants, units from non-cancelled orders
+    op.execute("""
+        UPDATE products p
+        SET min_effective_price = s.min_price,
+            max_effective_price = s.max_price
+        FROM (
+            SELECT product_id,
+                   min(price * (100 - coalesce(discount, 0)) / 100.0) AS min_price,
+                   max(price * (100 - coalesce(discount, 0)) / 100.0) AS max_price
+            FROM product_variants
+            GROUP BY product_id
+        ) s
+        WHERE s.product_id = p.id
+    """)
+    op.execute("""
+        UPDATE products p
+        SET units_sold = s.units_sold
+        FROM (
+            SELECT oi.product_id, sum(oi.quantity) AS units_sold
+            FROM order_items oi
+            JOIN orders o ON o.id = oi.order_id
+            WHERE o.order_status IS DISTINCT FROM 'cancelled'
+            GROUP BY oi.product_id
+        ) s
+        WHERE s.product_id = p.id
+    """)
+
+    op.create_index('ix_products_max_effective_price', 'products', ['max_effective_price'], unique=False)
+    op.create_index('ix_products_min_effective_price_id', 'products', ['min_effective_price', 'id'], unique=False)
+    op.create_index('ix_products_avg_rating_id', 'products', ['avg_rating', 'id'], unique=False)
+    op.create_index('ix_products_units_sold_id', 'products', ['units_sold', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_products_units_sold_id', table_name='products')
+    op.drop_index('ix_products_avg_rating_id', table_name='products')
+    op.drop_index('ix_products_min_effective_price_id', table_name='products')
+    op.drop_index('ix_products_max_effective_price', table_name='products')
+    op.drop_column('products', 'units_sold')
+    op.drop_column('products', 'max_effective_price')
+    op.drop_column('products', 'min_effective_price')
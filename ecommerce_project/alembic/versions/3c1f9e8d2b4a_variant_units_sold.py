@@ -0,0 +1,30 @@
+"""variant units sold
+
+Revision ID: 3c1f9e8d2b4a
+Revises: de53ed97df75
+Create Date: 2026-10-17 23:05:12.418307
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c1f9e8d2b4a'
+down_revision: Union[str, None] = 'de53ed97df75'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('product_variants', sa.Column('sold', sa.Integer(), server_default=sa.text('0'), nullable=False))
+    op.create_index('ix_product_variants_sold_pending', 'product_variants', ['id'], unique=False,
+                    postgresql_where=sa.text('sold <> 0'))
+
+
+def downgrade() -> None:
+    op.drop_index('ix_product_variants_sold_pending', table_name='product_variants',
+                  postgresql_where=sa.text('sold <> 0'))
+    op.drop_column('product_variants', 'sold')
@@ -0,0 +1,26 @@
+"""product version
+
+Revision ID: 61e96ea46bdc
+Revises: 9f260cd98f1f
+Create Date: 2026-10-17 10:02:17.530911
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '61e96ea46bdc'
+down_revision: Union[str, None] = '9f260cd98f1f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('products', sa.Column('version', sa.Integer(), server_default=sa.text('1'), nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('products', 'version')
@@ -0,0 +1,26 @@
+"""order items order_id index
+
+Revision ID: 80b53b97f04b
+Revises: ee793d7a2d7e
+Create Date: 2026-10-17 21:05:37.219846
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '80b53b97f04b'
+down_revision: Union[str, None] = 'ee793d7a2d7e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_order_items_order_id'), 'order_items', ['order_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_order_items_order_id'), table_name='order_items')
@@ -0,0 +1,42 @@
+"""variant attributes jsonb
+
+Revision ID: 96911b22ead8
+Revises: 094dd70f32cc
+Create Date: 2026-10-17 14:05:31.884120
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = '96911b22ead8'
+down_revision: Union[str, None] = '094dd70f32cc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.alter_column('product_variants', 'attributes',
+               existing_type=sa.JSON(),
+               type_=postgresql.JSONB(astext_type=sa.Text()),
+               existing_nullable=True,
+               postgresql_using='attributes::jsonb')
+    op.create_index('ix_product_variants_attributes', 'product_variants', ['attributes'], unique=False,
+                    postgresql_using='gin', postgresql_ops={'attributes': 'jsonb_path_ops'})
+    # Foreign keys used by every variant/image lookup had no index
+    op.create_index('ix_product_variants_product_id', 'product_variants', ['product_id'], unique=False)
+    op.create_index('ix_product_images_variant_id', 'product_images', ['variant_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_product_images_variant_id', table_name='product_images')
+    op.drop_index('ix_product_variants_product_id', table_name='product_variants')
+    op.drop_index('ix_product_variants_attributes', table_name='product_variants')
+    op.alter_column('product_variants', 'attributes',
+               existing_type=postgresql.JSONB(astext_type=sa.Text()),
+               type_=sa.JSON(),
+               existing_nullable=True,
+               postgresql_using='attributes::json')
@@ -0,0 +1,28 @@
+"""product keyset indexes
+
+Revision ID: 9f260cd98f1f
+Revises: 96536b1dcfec
+Create Date: 2026-10-17 09:12:40.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9f260cd98f1f'
+down_revision: Union[str, None] = '96536b1dcfec'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_products_created_at_id', 'products', ['created_at', 'id'], unique=False)
+    op.create_index('ix_products_category_id_created_at_id', 'products', ['category_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_products_category_id_created_at_id', table_name='products')
+    op.drop_index('ix_products_created_at_id', table_name='products')
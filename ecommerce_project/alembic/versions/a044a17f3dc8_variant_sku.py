@@ -0,0 +1,28 @@
+"""variant sku
+
+Revision ID: a044a17f3dc8
+Revises: bdd4e4807572
+Create Date: 2026-10-17 18:12:04.518337
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a044a17f3dc8'
+down_revision: Union[str, None] = 'bdd4e4807572'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('product_variants', sa.Column('sku', sa.String(), nullable=True))
+    op.create_unique_constraint('product_variants_sku_key', 'product_variants', ['sku'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('product_variants_sku_key', 'product_variants', type_='unique')
+    op.drop_column('product_variants', 'sku')
@@ -0,0 +1,27 @@
+"""product image derivatives
+
+Revision ID: bdd4e4807572
+Revises: d26175fd4461
+Create Date: 2026-10-17 17:41:36.220985
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'bdd4e4807572'
+down_revision: Union[str, None] = 'd26175fd4461'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Backfill with `python -m app.images`
+    op.add_column('product_images', sa.Column('derivatives', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('product_images', 'derivatives')
@@ -0,0 +1,49 @@
+"""import jobs
+
+Revision ID: ca3878538995
+Revises: 2dd326a6322f
+Create Date: 2026-10-17 16:10:52.804417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ca3878538995'
+down_revision: Union[str, None] = '2dd326a6322f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('import_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('admin_id', sa.Integer(), nullable=True),
+    sa.Column('status', sa.Enum('queued', 'running', 'completed', 'failed', name='importjobstatus'), nullable=False),
+    sa.Column('upload_dir', sa.String(), nullable=True),
+    sa.Column('rows_processed', sa.Integer(), server_default=sa.text('0'), nullable=False),
+    sa.Column('success_count', sa.Integer(), server_default=sa.text('0'), nullable=False),
+    sa.Column('error_count', sa.Integer(), server_default=sa.text('0'), nullable=False),
+    sa.Column('error_file', sa.String(), nullable=True),
+    sa.Column('error_details', sa.JSON(), nullable=True),
+    sa.Column('message', sa.Text(), nullable=True),
+    sa.Column('attempts', sa.Integer(), server_default=sa.text('0'), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['admin_id'], ['users.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_import_jobs_id'), 'import_jobs', ['id'], unique=False)
+    op.create_index(op.f('ix_import_jobs_status'), 'import_jobs', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_import_jobs_status'), table_name='import_jobs')
+    op.drop_index(op.f('ix_import_jobs_id'), table_name='import_jobs')
+    op.drop_table('import_jobs')
+    sa.Enum(name='importjobstatus').drop(op.get_bind(), checkfirst=True)
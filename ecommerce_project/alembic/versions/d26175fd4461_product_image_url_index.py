@@ -0,0 +1,26 @@
+"""product image url index
+
+Revision ID: d26175fd4461
+Revises: ca3878538995
+Create Date: 2026-10-17 16:58:14.092316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd26175fd4461'
+down_revision: Union[str, None] = 'ca3878538995'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_product_images_image_url'), 'product_images', ['image_url'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_product_images_image_url'), table_name='product_images')
@@ -0,0 +1,27 @@
+"""drop products avg_rating index
+
+Revision ID: de53ed97df75
+Revises: 80b53b97f04b
+Create Date: 2026-10-17 22:10:48.530114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'de53ed97df75'
+down_revision: Union[str, None] = '80b53b97f04b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # ix_products_avg_rating_id covers every lookup on avg_rating
+    op.drop_index('ix_products_avg_rating', table_name='products')
+
+
+def downgrade() -> None:
+    op.create_index('ix_products_avg_rating', 'products', ['avg_rating'], unique=False)
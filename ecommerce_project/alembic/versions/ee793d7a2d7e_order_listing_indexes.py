@@ -0,0 +1,33 @@
+"""order listing indexes
+
+Revision ID: ee793d7a2d7e
+Revises: f0a5e4a8e739
+Create Date: 2026-10-17 19:40:12.804531
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ee793d7a2d7e'
+down_revision: Union[str, None] = 'f0a5e4a8e739'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_orders_created_timestamp_id', 'orders',
+                    [sa.text('created_timestamp DESC'), sa.text('id DESC')], unique=False)
+    op.create_index('ix_orders_user_id_created_timestamp_id', 'orders',
+                    ['user_id', sa.text('created_timestamp DESC'), sa.text('id DESC')], unique=False)
+    op.create_index('ix_orders_order_status_created_timestamp_id', 'orders',
+                    ['order_status', sa.text('created_timestamp DESC'), sa.text('id DESC')], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_orders_order_status_created_timestamp_id', table_name='orders')
+    op.drop_index('ix_orders_user_id_created_timestamp_id', table_name='orders')
+    op.drop_index('ix_orders_created_timestamp_id', table_name='orders')
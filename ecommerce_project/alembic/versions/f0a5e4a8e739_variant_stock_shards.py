@@ -0,0 +1,37 @@
+"""variant stock shards
+
+Revision ID: f0a5e4a8e739
+Revises: a044a17f3dc8
+Create Date: 2026-10-17 19:02:47.613920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f0a5e4a8e739'
+down_revision: Union[str, None] = 'a044a17f3dc8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('product_variants', sa.Column('stock_sharded', sa.Boolean(), server_default=sa.text('false'), nullable=False))
+    op.create_table('variant_stock_shards',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('variant_id', sa.Integer(), nullable=False),
+    sa.Column('shard_no', sa.Integer(), nullable=False),
+    sa.Column('stock', sa.Integer(), server_default=sa.text('0'), nullable=False),
+    sa.Column('sold', sa.Integer(), server_default=sa.text('0'), nullable=False),
+    sa.ForeignKeyConstraint(['variant_id'], ['product_variants.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('variant_id', 'shard_no')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('variant_stock_shards')
+    op.drop_column('product_variants', 'stock_sharded')
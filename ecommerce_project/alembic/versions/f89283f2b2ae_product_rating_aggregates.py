@@ -0,0 +1,59 @@
+"""product rating aggregates
+
+Revision ID: f89283f2b2ae
+Revises: 61e96ea46bdc
+Create Date: 2026-10-17 11:26:03.402751
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f89283f2b2ae'
+down_revision: Union[str, None] = '61e96ea46bdc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COUNT_COLUMNS = ['review_count'] + [f'rating_{star}_count' for star in range(1, 6)]
+
+
+def upgrade() -> None:
+    op.add_column('products', sa.Column('avg_rating', sa.Float(), server_default=sa.text('0'), nullable=False))
+    for name in COUNT_COLUMNS:
+        op.add_column('products', sa.Column(name, sa.Integer(), server_default=sa.text('0'), nullable=False))
+    op.create_index('ix_products_avg_rating', 'products', ['avg_rating'], unique=False)
+
+    # Backfill from existing reviews; `python -m app.ratings --repair` fixes drift later
+    op.execute("""
+        UPDATE products p
+        SET review_count = s.review_count,
+            avg_rating = s.avg_rating,
+            rating_1_count = s.r1,
+            rating_2_count = s.r2,
+            rating_3_count = s.r3,
+            rating_4_count = s.r4,
+            rating_5_count = s.r5
+        FROM (
+            SELECT product_id,
+                   count(*) AS review_count,
+                   avg(rating) AS avg_rating,
+                   count(*) FILTER (WHERE rating = 1) AS r1,
+                   count(*) FILTER (WHERE rating = 2) AS r2,
+                   count(*) FILTER (WHERE rating = 3) AS r3,
+                   count(*) FILTER (WHERE rating = 4) AS r4,
+                   count(*) FILTER (WHERE rating = 5) AS r5
+            FROM reviews
+            GROUP BY product_id
+        ) s
+        WHERE s.product_id = p.id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_products_avg_rating', table_name='products')
+    for name in reversed(COUNT_COLUMNS):
+        op.drop_column('products', name)
+    op.drop_column('products', 'avg_rating')
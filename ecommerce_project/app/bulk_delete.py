@@ -0,0 +1,106 @@
+from sqlalchemy import delete, select, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models import OrderItem, Product, ProductImage, ProductVariant, Review
+from app.catalog import invalidate_catalog
+from app.storage import release_files
+
+DELETE_CHUNK_SIZE = 500
+# Give up on a chunk rather than queue behind live traffic
+DELETE_LOCK_TIMEOUT = "2s"
+DELETE_RETRY_AFTER = 2  # seconds, suggested to clients that found a product busy
+
+
+# Bulk product deletion. Matching products are deleted a chunk at a time in
+# id order, each chunk in its own short transaction with the same handful of
+# set-based statements however many products it holds. Product rows are
+# locked with SKIP LOCKED, so a product that checkout or an edit is holding
+# is reported as busy instead of blocking. Products that appear in orders are
+# kept: order history references their variants.
+
+def product_filter(product_ids=None, brand=None, category_id=None) -> list:
+    conditions = []
+    if product_ids is not None:
+        conditions.append(Product.id.in_(product_ids))
+    if brand is not None:
+        conditions.append(Product.brand == brand)
+    if category_id is not None:
+        conditions.append(Product.category_id == category_id)
+    return conditions
+
+
+def delete_chunk(db: Session, product_ids: list) -> dict:
+    """Delete ``product_ids`` in one transaction; the caller commits.
+
+    Returns the deleted, busy and has_orders ids, plus image_urls,
+    category_ids and featured for invalidation and file cleanup.
+    """
+    db.execute(text(f"SET LOCAL lock_timeout = '{DELETE_LOCK_TIMEOUT}'"))
+    locked = db.execute(
+        select(Product.id, Product.category_id, Product.is_feature)
+        .where(Product.id.in_(product_ids))
+        .with_for_update(skip_locked=True)
+    ).all()
+    # Checked after locking: new order items need a key-share lock on the product
+    ordered = set(db.scalars(
+        select(OrderItem.product_id).where(OrderItem.product_id.in_([row.id for row in locked])).distinct()
+    ))
+    deletable = [row for row in locked if row.id not in ordered]
+    ids = [row.id for row in deletable]
+
+    image_urls = []
+    if ids:
+        variant_ids = select(ProductVariant.id).where(ProductVariant.product_id.in_(ids))
+        image_urls = db.scalars(
+            delete(ProductImage).where(ProductImage.variant_id.in_(variant_ids)).returning(ProductImage.image_url)
+        ).all()
+        db.execute(delete(ProductVariant).where(ProductVariant.product_id.in_(ids)))
+        db.execute(delete(Review).where(Review.product_id.in_(ids)))
+        db.execute(delete(Product).where(Product.id.in_(ids)))
+
+    locked_ids = {row.id for row in locked}
+    return {
+        "deleted": ids,
+        "busy": [product_id for product_id in product_ids if product_id not in locked_ids],
+        "has_orders": sorted(ordered),
+        "image_urls": set(image_urls),
+        "category_ids": {row.category_id for row in deletable},
+        "featured": any(row.is_feature for row in deletable),
+    }
+
+
+def delete_products(db: Session, conditions: list, chunk_size: int = DELETE_CHUNK_SIZE) -> dict:
+    """Delete every product matching ``conditions``, chunk by chunk."""
+    result = {"deleted": [], "busy": [], "has_orders": [], "image_urls": set()}
+    last_id = 0
+    while True:
+        product_ids = db.scalars(
+            select(Product.id).where(*conditions, Product.id > last_id).order_by(Product.id).limit(chunk_size)
+        ).all()
+        if not product_ids:
+            return result
+        last_id = product_ids[-1]
+
+        try:
+            chunk = delete_chunk(db, product_ids)
+            db.commit()
+        except OperationalError:
+            # lock_timeout: something else holds rows of this chunk
+            db.rollback()
+            result["busy"].extend(product_ids)
+            continue
+        if chunk["deleted"]:
+            invalidate_catalog(chunk["deleted"], chunk["category_ids"], featured=chunk["featured"])
+        for key in ("deleted", "busy", "has_orders"):
+            result[key].extend(chunk[key])
+        result["image_urls"] |= chunk["image_urls"]
+
+
+def release_orphaned_files(urls):
+    """Background task: remove files the deleted products left unreferenced."""
+    db = SessionLocal()
+    try:
+        release_files(db, urls)
+    finally:
+        db.close()
@@ -0,0 +1,194 @@
+import codecs, csv, io, json, math, tempfile
+from fastapi import HTTPException, Request
+from sqlalchemy import Float, Integer, cast, column, func, or_, update, values
+from sqlalchemy.orm import Session
+from app.models import Product, ProductVariant
+from app.catalog import refresh_price_bounds, bump_versions, invalidate_catalog
+from app.stock import reset_shards
+
+BULK_CHUNK_SIZE = 1000
+MAX_BULK_ENTRIES = 50000
+# CSV bodies larger than this are spooled to a temporary file
+CSV_SPOOL_SIZE = 1024 * 1024
+UPDATE_FIELDS = ("price", "stock", "discount")
+
+
+# Bulk price/stock updates. Entries identify a variant by variant_id or sku
+# and carry any of price, stock and discount. Each chunk is resolved with
+# one SELECT and applied with one UPDATE ... FROM (VALUES ...), skipping rows
+# whose values would not change, and commits on its own.
+
+async def _lines(request: Request):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    async for chunk in request.stream():
+        pending += decoder.decode(chunk)
+        *lines, pending = pending.split("\n")
+        for line in lines:
+            yield line
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+async def _spool(request: Request):
+    spool = tempfile.SpooledTemporaryFile(max_size=CSV_SPOOL_SIZE)
+    async for chunk in request.stream():
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+
+def _csv_entries(stream):
+    # csv.reader over the whole stream, so quoted fields may contain newlines
+    header = None
+    for row in csv.reader(io.TextIOWrapper(stream, encoding="utf-8", newline="")):
+        if not any(value.strip() for value in row):
+            continue
+        if header is None:
+            header = [name.strip() for name in row]
+            continue
+        yield {name: value for name, value in zip(header, row) if value != ""}
+
+
+async def read_entries(request: Request):
+    """Yield entry dicts from a JSON array, NDJSON or CSV request body."""
+    content_type = request.headers.get("content-type", "application/json").split(";")[0].strip()
+    if content_type == "application/json":
+        try:
+            entries = json.loads(await request.body())
+        except json.JSONDecodeError:
+            raise HTTPException(status_code=400, detail="Body is not valid JSON")
+        if not isinstance(entries, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array of entries")
+        for entry in entries:
+            yield entry
+    elif content_type == "application/x-ndjson":
+        async for line in _lines(request):
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError as e:
+                    yield {"error": f"invalid JSON: {e}"}
+    elif content_type == "text/csv":
+        with await _spool(request) as spool:
+            try:
+                for entry in _csv_entries(spool):
+                    yield entry
+            except (csv.Error, UnicodeDecodeError) as e:
+                raise HTTPException(status_code=400, detail=f"Body is not valid UTF-8 CSV: {e}")
+    else:
+        raise HTTPException(status_code=415, detail="Send application/json, application/x-ndjson or text/csv")
+
+
+def _parse_entry(entry) -> dict:
+    if not isinstance(entry, dict):
+        raise ValueError("entry must be an object")
+    if "error" in entry:
+        raise ValueError(entry["error"])
+    parsed = {"variant_id": None, "sku": None}
+    if entry.get("variant_id") is not None:
+        parsed["variant_id"] = int(entry["variant_id"])
+    elif entry.get("sku"):
+        parsed["sku"] = str(entry["sku"])
+    else:
+        raise ValueError("variant_id or sku is required")
+
+    price = entry.get("price")
+    stock = entry.get("stock")
+    discount = entry.get("discount")
+    parsed["price"] = None if price is None else float(price)
+    parsed["stock"] = None if stock is None else int(stock)
+    parsed["discount"] = None if discount is None else int(discount)
+    if all(parsed[field] is None for field in UPDATE_FIELDS):
+        raise ValueError("nothing to update: give price, stock or discount")
+    if parsed["price"] is not None and not math.isfinite(parsed["price"]):
+        raise ValueError("price must be a finite number")
+    if parsed["price"] is not None and parsed["price"] <= 0:
+        raise ValueError("price must be greater than 0")
+    if parsed["stock"] is not None and parsed["stock"] < 0:
+        raise ValueError("stock cannot be negative")
+    if parsed["discount"] is not None and not 0 <= parsed["discount"] <= 100:
+        raise ValueError("discount must be between 0 and 100")
+    return parsed
+
+
+def apply_chunk(db: Session, entries: list, offset: int) -> list:
+    """Apply one chunk; returns an outcome per entry, in order."""
+    outcomes = []
+    parsed = {}
+    for index, entry in enumerate(entries, start=offset):
+        outcome = {"index": index}
+        if isinstance(entry, dict):
+            outcome.update({key: entry[key] for key in ("variant_id", "sku") if entry.get(key) is not None})
+        try:
+            parsed[index] = _parse_entry(entry)
+        except (TypeError, ValueError, OverflowError) as e:
+            outcome.update(status="invalid", error=str(e))
+        outcomes.append(outcome)
+
+    # Resolve ids and skus in one query
+    ids = {entry["variant_id"] for entry in parsed.values() if entry["variant_id"] is not None}
+    skus = {entry["sku"] for entry in parsed.values() if entry["sku"] is not None}
+    known_ids, id_by_sku = set(), {}
+    if ids or skus:
+        for variant_id, sku in db.query(ProductVariant.id, ProductVariant.sku).filter(
+            or_(ProductVariant.id.in_(ids), ProductVariant.sku.in_(skus))
+        ):
+            known_ids.add(variant_id)
+            if sku is not None:
+                id_by_sku[sku] = variant_id
+
+    # Last entry per variant wins
+    rows = {}
+    for index, entry in parsed.items():
+        variant_id = entry["variant_id"] if entry["sku"] is None else id_by_sku.get(entry["sku"])
+        outcome = outcomes[index - offset]
+        if variant_id is None or variant_id not in known_ids:
+            outcome.update(status="not_found")
+            continue
+        if variant_id in rows:
+            outcomes[rows[variant_id][0] - offset].update(status="skipped", error="superseded by a later entry")
+        outcome.update(variant_id=variant_id, status="unchanged")
+        rows[variant_id] = (index, entry["price"], entry["stock"], entry["discount"])
+    if not rows:
+        return outcomes
+
+    data = values(
+        column("variant_id", Integer), column("idx", Integer), column("price", Float),
+        column("stock", Integer), column("discount", Integer),
+        name="v",
+    ).data([(variant_id, *row) for variant_id, row in rows.items()])
+    # Casts pin the column types when a whole VALUES column is NULL
+    new_price = func.coalesce(cast(data.c.price, Float), ProductVariant.price)
+    new_stock = func.coalesce(cast(data.c.stock, Integer), ProductVariant.stock)
+    # Sharded variants: a given stock is the new total, compared with pool + buckets
+    new_total = func.coalesce(cast(data.c.stock, Integer), ProductVariant.available_stock)
+    new_discount = func.coalesce(cast(data.c.discount, Integer), ProductVariant.discount)
+    updated = db.execute(
+        update(ProductVariant)
+        .where(ProductVariant.id == cast(data.c.variant_id, Integer))
+        .where(or_(
+            ProductVariant.price.is_distinct_from(new_price),
+            ProductVariant.available_stock.is_distinct_from(new_total),
+            ProductVariant.discount.is_distinct_from(new_discount),
+        ))
+        .values(price=new_price, stock=new_stock, discount=new_discount)
+        .returning(cast(data.c.idx, Integer), ProductVariant.product_id, ProductVariant.id,
+                   ProductVariant.stock_sharded & cast(data.c.stock, Integer).isnot(None))
+    ).all()
+
+    product_ids = set()
+    for index, product_id, _, _ in updated:
+        outcomes[index - offset]["status"] = "updated"
+        product_ids.add(product_id)
+    reset_shards(db, [variant_id for _, _, variant_id, restocked in updated if restocked])
+    if product_ids:
+        refresh_price_bounds(db, product_ids)
+        bump_versions(db, product_ids)
+        category_ids = {category_id for (category_id,) in
+                        db.query(Product.category_id).filter(Product.id.in_(product_ids)).distinct()}
+    db.commit()
+    if product_ids:
+        invalidate_catalog(product_ids, category_ids)
+    return outcomes
@@ -0,0 +1,410 @@
+import base64, hashlib, json
+from datetime import datetime
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from sqlalchemy import tuple_, select, func, and_, or_, true, distinct, case, cast, Float
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.orm import Session, selectinload
+from app.models import Product, ProductVariant, ProductImage, VariantAttribute, CategoryVariantAttribute
+from app.schemas import ProductResponse, ProductVariantResponse, ProductCardResponse, ProductView, ProductSort
+from app.cache import catalog_cache
+from app.images import srcsets, card_image_url
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+# Catalog query layer shared by the product read endpoints.
+# Variants and images are loaded with selectin loading, so any number of
+# products costs three statements: products, their variants, their images.
+
+def catalog_query(db: Session):
+    return db.query(Product).options(
+        selectinload(Product.variants).selectinload(ProductVariant.images)
+    )
+
+
+# Card view: a single column-restricted select. Description, variant
+# attributes and the full image list are never read from the database.
+
+def card_query(db: Session):
+    min_price = (
+        select(func.min(ProductVariant.price))
+        .where(ProductVariant.product_id == Product.id)
+        .correlate(Product)
+        .scalar_subquery()
+    )
+    def first_image(column):
+        return (
+            select(column)
+            .join(ProductVariant, ProductVariant.id == ProductImage.variant_id)
+            .where(ProductVariant.product_id == Product.id)
+            .order_by(ProductVariant.id, ProductImage.id)
+            .limit(1)
+            .correlate(Product)
+            .scalar_subquery()
+        )
+
+    return db.query(
+        Product.id,
+        Product.product_name,
+        Product.brand,
+        Product.created_at,
+        min_price.label("min_price"),
+        first_image(ProductImage.image_url).label("thumbnail"),
+        first_image(ProductImage.derivatives).label("thumbnail_derivatives"),
+    )
+
+
+def listing_query(db: Session, view: ProductView):
+    return card_query(db) if view == ProductView.card else catalog_query(db)
+
+
+def serialize_card(row) -> ProductCardResponse:
+    return ProductCardResponse(
+        id=row.id,
+        product_name=row.product_name,
+        brand=row.brand,
+        thumbnail=card_image_url(row.thumbnail, row.thumbnail_derivatives),
+        thumbnail_srcset=srcsets(row.thumbnail_derivatives),
+        min_price=row.min_price,
+    )
+
+
+def serialize_listing(rows, view: ProductView) -> list:
+    if view == ProductView.card:
+        return [serialize_card(row) for row in rows]
+    return [serialize_product(product) for product in rows]
+
+
+def serialize_variant(variant: ProductVariant) -> ProductVariantResponse:
+    return ProductVariantResponse(
+        id=variant.id,
+        price=variant.price,
+        stock=variant.available_stock,
+        discount=variant.discount,
+        shipping_time=variant.shipping_time,
+        attributes=variant.attributes or {},
+        images=[img.image_url for img in variant.images],
+        image_srcsets=[srcsets(img.derivatives) for img in variant.images],
+    )
+
+
+def serialize_product(product: Product) -> ProductResponse:
+    return ProductResponse(
+        id=product.id,
+        sku=product.sku,
+        product_name=product.product_name,
+        brand=product.brand,
+        category_id=product.category_id,
+        description=product.description,
+        admin_id=product.admin_id,
+        created_at=product.created_at,
+        updated_at=product.updated_at,
+        variants=[serialize_variant(variant) for variant in product.variants],
+    )
+
+
+# Keyset pagination over (created_at, id), newest first.
+# The cursor is the sort key of the last row of the previous page, so every
+# page is an index range scan and deep pages cost the same as the first one.
+
+def encode_cursor(*values) -> str:
+    raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(values, list):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def keyset_page(query, cursor: str | None, limit: int):
+    query = query.order_by(Product.created_at.desc(), Product.id.desc())
+    if cursor:
+        try:
+            created_at, product_id = decode_cursor(cursor)
+            created_at, product_id = datetime.fromisoformat(created_at), int(product_id)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.filter(tuple_(Product.created_at, Product.id) < (created_at, product_id))
+    return query.limit(limit + 1)
+
+
+def paginate_products(query, cursor: str | None, limit: int):
+    rows = keyset_page(query, cursor, limit).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
+
+
+# Sorting and price filtering for the /sort router. Every sort key is a
+# stored, indexed product column and id breaks ties, so pages are stable
+# keyset ranges and each product appears once.
+
+SORT_COLUMNS = {
+    ProductSort.price: Product.min_effective_price,
+    ProductSort.rating: Product.avg_rating,
+    ProductSort.popularity: Product.units_sold,
+    ProductSort.newest: Product.created_at,
+}
+
+
+# Parses a cursor's sort value: a forged one is a 400, not a database error
+CURSOR_VALUES = {
+    ProductSort.price: float,
+    ProductSort.rating: float,
+    ProductSort.popularity: int,
+    ProductSort.newest: datetime.fromisoformat,
+}
+
+
+def effective_price():
+    return ProductVariant.price * (100 - func.coalesce(ProductVariant.discount, 0)) / 100.0
+
+
+def sorted_page(query, sort: ProductSort, descending: bool, cursor: str | None, limit: int,
+                min_price: float | None = None, max_price: float | None = None):
+    column = SORT_COLUMNS[sort]
+    query = query.filter(column.isnot(None))
+    if min_price is not None:
+        query = query.filter(Product.max_effective_price >= min_price)
+    if max_price is not None:
+        query = query.filter(Product.min_effective_price <= max_price)
+
+    if cursor:
+        try:
+            last_value, last_id = decode_cursor(cursor)
+            last_value = CURSOR_VALUES[sort](last_value)
+            last_id = int(last_id)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        key = tuple_(column, Product.id)
+        query = query.filter(key < (last_value, last_id) if descending else key > (last_value, last_id))
+
+    if descending:
+        query = query.order_by(column.desc(), Product.id.desc())
+    else:
+        query = query.order_by(column.asc(), Product.id.asc())
+    rows = query.add_columns(column.label("sort_key")).limit(limit + 1).all()
+    # Full view rows are (Product, sort_key); card rows are flat and keep the extra column
+    items = [row[0] if isinstance(row[0], Product) else row for row in rows]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows, items = rows[:limit], items[:limit]
+        next_cursor = encode_cursor(rows[-1].sort_key, items[-1].id)
+    return items, next_cursor
+
+
+def refresh_price_bounds(db: Session, product_ids):
+    """Recompute min/max effective price; call after variants change."""
+    if not product_ids:
+        return
+    def bound(aggregate):
+        return (
+            select(aggregate(effective_price()))
+            .where(ProductVariant.product_id == Product.id)
+            .correlate(Product)
+            .scalar_subquery()
+        )
+
+    db.query(Product).filter(Product.id.in_(list(product_ids))).update(
+        {Product.min_effective_price: bound(func.min), Product.max_effective_price: bound(func.max)},
+        synchronize_session=False,
+    )
+
+
+def record_sales(db: Session, quantities: dict):
+    """Add (or with negative quantities, remove) units sold per product id."""
+    quantities = {product_id: qty for product_id, qty in quantities.items() if qty}
+    if not quantities:
+        return
+    db.query(Product).filter(Product.id.in_(list(quantities))).update(
+        {Product.units_sold: Product.units_sold + case(quantities, value=Product.id, else_=0)},
+        synchronize_session=False,
+    )
+
+
+# Full-text search over products.search_vector (GIN indexed). Ranked
+# results are paged on (rank, id); only ids are selected for ranking and the
+# page itself is loaded afterwards in the requested view.
+
+SEARCH_CONFIG = "english"
+
+
+def search_page(db: Session, q: str, cursor: str | None, limit: int):
+    tsquery = func.websearch_to_tsquery(SEARCH_CONFIG, q)
+    # ts_rank_cd is float4; as float8 the rank round-trips through the cursor exactly
+    rank = cast(func.ts_rank_cd(Product.search_vector, tsquery), Float(53))
+    query = db.query(Product.id, rank.label("rank")).filter(Product.search_vector.op("@@")(tsquery))
+    if cursor:
+        try:
+            last_rank, last_id = decode_cursor(cursor)
+            last_rank, last_id = float(last_rank), int(last_id)
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        query = query.filter(tuple_(rank, Product.id) < (last_rank, last_id))
+
+    rows = query.order_by(rank.desc(), Product.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].rank, rows[-1].id)
+    return [row.id for row in rows], next_cursor
+
+
+def load_listing(db: Session, view: ProductView, product_ids: list[int]) -> list:
+    """Load products by id in the requested view, keeping the given order."""
+    if not product_ids:
+        return []
+    rows = {row.id: row for row in listing_query(db, view).filter(Product.id.in_(product_ids))}
+    return [rows[product_id] for product_id in product_ids if product_id in rows]
+
+
+# Attribute filtering and facets over ProductVariant.attributes (JSONB, GIN
+# jsonb_path_ops). Values of one attribute are OR-ed, attributes are AND-ed,
+# and all of them must hold on the same variant.
+
+def facet_names(db: Session, category_id: int | None = None) -> list[str]:
+    query = db.query(VariantAttribute.name)
+    if category_id is not None:
+        query = query.join(CategoryVariantAttribute, CategoryVariantAttribute.attribute_id == VariantAttribute.id)\
+                     .filter(CategoryVariantAttribute.category_id == category_id)
+    return sorted({name for (name,) in query})
+
+
+def _attribute_condition(name: str, values: list[str]):
+    return or_(*[ProductVariant.attributes.contains({name: value}) for value in values])
+
+
+def attribute_filter(selected: dict):
+    """Products having a variant that matches every selected attribute."""
+    if not selected:
+        return true()
+    conditions = [_attribute_condition(name, values) for name, values in selected.items()]
+    return Product.id.in_(select(ProductVariant.product_id).where(and_(*conditions)))
+
+
+def facet_counts(db: Session, filters, selected: dict, names: list[str]) -> dict:
+    """Count matching products per attribute value in one aggregate query.
+
+    Each attribute's counts ignore that attribute's own selection, so the
+    client can still offer the other values of a facet that is in use.
+    """
+    if not names:
+        return {}
+    kv = func.jsonb_each_text(ProductVariant.attributes).table_valued("key", "value").render_derived(name="kv")
+    query = (
+        db.query(kv.c.key, kv.c.value, func.count(distinct(ProductVariant.product_id)))
+        .select_from(ProductVariant)
+        .join(Product, Product.id == ProductVariant.product_id)
+        .join(kv, true())
+        # jsonb_each_text raises on anything but an object
+        .filter(func.jsonb_typeof(ProductVariant.attributes) == "object")
+        .filter(*filters, kv.c.key.in_(names))
+        .filter(*[or_(kv.c.key == name, _attribute_condition(name, values)) for name, values in selected.items()])
+        .group_by(kv.c.key, kv.c.value)
+    )
+    facets = {name: {} for name in names}
+    for key, value, count in query:
+        facets[key][value] = count
+    return facets
+
+
+def page_response(page: dict, legacy: bool, headers: dict | None = None) -> JSONResponse:
+    if legacy:
+        headers = dict(headers or {})
+        if page["next_cursor"]:
+            headers["X-Next-Cursor"] = page["next_cursor"]
+        return JSONResponse(page["items"], headers=headers)
+    return JSONResponse(page, headers=headers)
+
+
+# Cache invalidation for catalog writes. Lists that can contain the changed
+# products are dropped by tag; unrelated categories stay cached.
+
+def invalidate_catalog(product_ids=(), category_ids=(), featured: bool = True):
+    tags = ["all"]
+    tags += [f"product:{product_id}" for product_id in product_ids]
+    tags += [f"category:{category_id}" for category_id in category_ids]
+    if featured:
+        tags.append("featured")
+    catalog_cache.invalidate(*tags)
+
+
+# Conditional GET. Product.version changes whenever a product, its variants
+# or their images change; stock is not versioned, because checkout and
+# cancel would then lock the product row. So (id, version, variant stock)
+# of the rows a response is built from validates it without loading or
+# serializing anything.
+# The endpoints also key catalog_cache on the ETag: with several workers,
+# each with its own cache, a body cached before another worker's write is
+# never served under the new validator.
+
+CACHE_CONTROL = {
+    "product": "public, max-age=60",
+    "listing": "public, max-age=30",
+    "featured": "public, max-age=300",
+    "category": "public, max-age=300",
+}
+
+
+def make_etag(*parts) -> str:
+    return 'W/"%s"' % hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def _variant_stock():
+    return (
+        select(func.array_agg(aggregate_order_by(ProductVariant.available_stock, ProductVariant.id)))
+        .where(ProductVariant.product_id == Product.id)
+        .correlate(Product)
+        .scalar_subquery()
+    )
+
+
+def product_etag(db: Session, product_id: int) -> str | None:
+    row = db.query(Product.version, _variant_stock()).filter(Product.id == product_id).first()
+    if row is None:
+        return None
+    return make_etag("product", product_id, tuple(row))
+
+
+def listing_etag(db: Session, filters, *parts, cursor: str | None = None, limit: int | None = None) -> str:
+    query = db.query(Product.id, Product.version, _variant_stock()).filter(*filters)
+    if limit is not None:
+        query = keyset_page(query, cursor, limit)
+    else:
+        # Row order is part of the hash; without ORDER BY Postgres may vary it
+        query = query.order_by(Product.id)
+    return make_etag(parts, [tuple(row) for row in query.all()])
+
+
+def not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    candidates = {tag.strip().removeprefix("W/") for tag in header.split(",")}
+    return etag.removeprefix("W/") in candidates
+
+
+def not_modified_response(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+def bump_versions(db: Session, product_ids):
+    """Mark products as changed; call in the same transaction as the write."""
+    if product_ids:
+        db.query(Product).filter(Product.id.in_(list(product_ids))).update(
+            {Product.version: Product.version + 1, Product.updated_at: func.now()},
+            synchronize_session=False,
+        )
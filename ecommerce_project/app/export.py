@@ -0,0 +1,62 @@
+import csv, io, json
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+from app.database import SessionLocal
+from app.models import Product, ProductVariant
+from app.catalog import serialize_product
+
+EXPORT_BATCH_SIZE = 500
+
+CSV_COLUMNS = [
+    "product_id", "sku", "product_name", "brand", "category_id", "description",
+    "variant_id", "variant_sku", "price", "discount", "stock", "shipping_time", "attributes", "images",
+]
+
+
+# Full catalog export for feeds. Products are read through a server-side
+# cursor in batches of EXPORT_BATCH_SIZE; each batch's variants and images
+# are selectin-loaded and written out before the next batch is fetched. The
+# identity map only holds weak references, so memory stays flat however large
+# the catalog is.
+#
+# The generators open their own session: FastAPI closes dependency sessions
+# before a StreamingResponse body is sent.
+
+def _product_batches():
+    db = SessionLocal()
+    try:
+        stmt = (
+            select(Product)
+            .options(selectinload(Product.variants).selectinload(ProductVariant.images))
+            .order_by(Product.id)
+            .execution_options(yield_per=EXPORT_BATCH_SIZE)
+        )
+        for batch in db.execute(stmt).scalars().partitions():
+            yield batch
+    finally:
+        db.close()
+
+
+def iter_ndjson():
+    """One ProductResponse JSON document per line."""
+    for batch in _product_batches():
+        yield "".join(serialize_product(product).model_dump_json() + "\n" for product in batch)
+
+
+def iter_csv():
+    """One row per variant, product columns repeated."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    for batch in _product_batches():
+        for product in batch:
+            for variant in product.variants:
+                writer.writerow([
+                    product.id, product.sku, product.product_name, product.brand, product.category_id,
+                    product.description, variant.id, variant.sku, variant.price, variant.discount, variant.available_stock,
+                    variant.shipping_time, json.dumps(variant.attributes or {}),
+                    "|".join(image.image_url for image in variant.images),
+                ])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
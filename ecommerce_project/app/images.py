@@ -0,0 +1,140 @@
+import argparse, asyncio, multiprocessing, os, tempfile
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image, ImageOps, UnidentifiedImageError
+from sqlalchemy import or_
+from app.database import SessionLocal
+from app.models import ProductImage, ProductVariant
+from app.storage import CONTENT_URL, content_path, store_file
+
+# Longest edge in pixels, smallest first; images are never upscaled
+DERIVATIVE_SIZES = {"thumb": 160, "card": 480, "zoom": 1600}
+DERIVATIVE_FORMATS = {"webp": "WEBP", "jpeg": "JPEG"}
+DERIVATIVE_QUALITY = 82
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+LEGACY_PREFIXES = ("/media/uploads/", "/static/uploads/")
+
+
+# Image derivatives. Every stored original gets a resized copy per size in
+# every format, written next to it as <hash>-<size>.<format> so they are
+# content-addressed and immutable too. Resizing runs in a process pool,
+# never on a request worker. The result is kept in ProductImage.derivatives:
+#
+#     {"thumb": {"width": 160, "webp": "/media/content/..", "jpeg": ".."}, ...}
+
+def render_derivatives(url: str) -> dict | None:
+    """Build the derivatives of a stored original; None if it is not an image."""
+    path = content_path(url)
+    stem, _ = os.path.splitext(path)
+    url_stem, _ = os.path.splitext(url)
+    try:
+        with Image.open(path) as original:
+            original = ImageOps.exif_transpose(original).convert("RGB")
+    except (UnidentifiedImageError, OSError):
+        return None
+
+    derivatives, widths = {}, set()
+    for name, size in DERIVATIVE_SIZES.items():
+        image = original.copy()
+        image.thumbnail((size, size), Image.LANCZOS)
+        if image.width in widths:
+            continue
+        widths.add(image.width)
+        derivatives[name] = {"width": image.width}
+        for ext, image_format in DERIVATIVE_FORMATS.items():
+            target = f"{stem}-{name}.{ext}"
+            if not os.path.exists(target):
+                fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+                with os.fdopen(fd, "wb") as out:
+                    image.save(out, image_format, quality=DERIVATIVE_QUALITY)
+                os.replace(tmp_path, target)
+            derivatives[name][ext] = f"{url_stem}-{name}.{ext}"
+        if size >= max(original.size):
+            # Larger sizes would be copies of the original size
+            break
+    return derivatives
+
+
+_pool = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: the parent runs server and import threads, which fork would copy mid-flight
+        _pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+async def build_derivatives(urls: list[str]) -> list[dict | None]:
+    loop = asyncio.get_running_loop()
+    return list(await asyncio.gather(*[loop.run_in_executor(_get_pool(), render_derivatives, url) for url in urls]))
+
+
+def build_derivatives_sync(urls: list[str]) -> list[dict | None]:
+    """For callers already off the event loop, e.g. the import worker."""
+    return list(_get_pool().map(render_derivatives, urls))
+
+
+def srcsets(derivatives: dict | None) -> dict:
+    """{"webp": "<url> 160w, <url> 480w, ...", "jpeg": ...} for <img srcset>."""
+    if not derivatives:
+        return {}
+    # One candidate per width: a repeated "Nw" descriptor makes the srcset invalid
+    by_width = {derivative["width"]: derivative for derivative in derivatives.values()}
+    sizes = [by_width[width] for width in sorted(by_width)]
+    return {ext: ", ".join(f"{size[ext]} {size['width']}w" for size in sizes) for ext in DERIVATIVE_FORMATS}
+
+
+def card_image_url(image_url: str | None, derivatives: dict | None) -> str | None:
+    """The card-sized JPEG when there is one, else the original."""
+    if derivatives and "card" in derivatives:
+        return derivatives["card"]["jpeg"]
+    return image_url
+
+
+def regenerate(db, everything: bool = False, batch_size: int = 100) -> int:
+    """Backfill derivatives; legacy media/uploads originals move into content storage.
+
+    Returns the number of images updated. Products whose image URLs change
+    get a new version, so their ETags change.
+    """
+    from app.catalog import bump_versions
+
+    query = db.query(ProductImage).order_by(ProductImage.id)
+    if not everything:
+        query = query.filter(or_(ProductImage.derivatives.is_(None), ~ProductImage.image_url.startswith(CONTENT_URL)))
+    updated = 0
+    last_id = 0
+    while True:
+        images = query.filter(ProductImage.id > last_id).limit(batch_size).all()
+        if not images:
+            return updated
+        last_id = images[-1].id
+
+        for image in images:
+            if image.image_url.startswith(LEGACY_PREFIXES):
+                legacy_path = os.path.join("media/uploads", image.image_url.split("/uploads/", 1)[1])
+                if not os.path.exists(legacy_path):
+                    continue
+                with open(legacy_path, "rb") as src:
+                    image.image_url = store_file(src, legacy_path)
+        images = [image for image in images if content_path(image.image_url)]
+        for image, derivatives in zip(images, build_derivatives_sync([image.image_url for image in images])):
+            image.derivatives = derivatives
+        product_ids = {variant.product_id for variant in
+                       db.query(ProductVariant).filter(ProductVariant.id.in_({image.variant_id for image in images}))}
+        bump_versions(db, product_ids)
+        db.commit()
+        updated += len(images)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate product image derivatives")
+    parser.add_argument("--all", action="store_true", help="rebuild every image, not only those missing derivatives")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        print(f"updated {regenerate(db, everything=args.all)} images")
+    finally:
+        db.close()
@@ -0,0 +1,215 @@
+import csv, logging, os, shutil, threading
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from fastapi import UploadFile
+from sqlalchemy import or_, and_, func
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models import ImportJob, ImportJobStatus
+from app.importer import import_products
+from app.catalog import invalidate_catalog
+from app.storage import store_file, release_files
+from app.images import build_derivatives_sync
+
+logger = logging.getLogger(__name__)
+
+IMPORT_DIR = "media/imports"
+ERROR_DIR = "media/errors"
+os.makedirs(IMPORT_DIR, exist_ok=True)
+os.makedirs(ERROR_DIR, exist_ok=True)
+
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", "2"))
+POLL_INTERVAL = 2  # seconds
+STALE_AFTER = timedelta(minutes=5)  # a running job without a heartbeat this long is reclaimed
+HEARTBEAT_INTERVAL = 30  # seconds
+MAX_ATTEMPTS = 3
+ERROR_DETAILS_LIMIT = 5
+
+
+# Bulk imports run as jobs. The endpoint only stores the upload under
+# media/imports/<job id>/ and queues a row in import_jobs; worker threads
+# claim queued jobs with SELECT ... FOR UPDATE SKIP LOCKED. Progress is
+# written in the same transaction as each imported chunk, so a job whose
+# worker died (no heartbeat for STALE_AFTER) is picked up again and resumes
+# after the last committed chunk. While a job runs, a heartbeat thread with
+# its own session refreshes heartbeat_at every HEARTBEAT_INTERVAL, however
+# long a chunk takes.
+
+def create_job(db: Session, admin_id: int, file: UploadFile, images: list[UploadFile]) -> ImportJob:
+    job = ImportJob(admin_id=admin_id, status=ImportJobStatus.queued)
+    db.add(job)
+    db.flush()
+
+    upload_dir = os.path.join(IMPORT_DIR, str(job.id))
+    os.makedirs(os.path.join(upload_dir, "images"), exist_ok=True)
+    with open(os.path.join(upload_dir, "products.csv"), "wb") as out:
+        shutil.copyfileobj(file.file, out)
+    for image in images:
+        with open(os.path.join(upload_dir, "images", os.path.basename(image.filename)), "wb") as out:
+            shutil.copyfileobj(image.file, out)
+
+    job.upload_dir = upload_dir
+    db.commit()
+    _wake.set()
+    return job
+
+
+def save_image(path: str, product_name: str, attributes: dict) -> dict:
+    with open(path, "rb") as src:
+        return {"image_url": store_file(src, path)}
+
+
+def add_derivatives(images: list[dict]):
+    """Render a chunk's images in one batch over the image pool."""
+    urls = list(dict.fromkeys(image["image_url"] for image in images))
+    derivatives = dict(zip(urls, build_derivatives_sync(urls)))
+    for image in images:
+        image["derivatives"] = derivatives[image["image_url"]]
+
+
+def rows_per_second(job: ImportJob) -> float | None:
+    if not job.started_at:
+        return None
+    elapsed = ((job.finished_at or datetime.now(timezone.utc)) - job.started_at).total_seconds()
+    return round(job.rows_processed / elapsed, 1) if elapsed > 0 else None
+
+
+def claim_job(db: Session) -> ImportJob | None:
+    job = (
+        db.query(ImportJob)
+        .filter(or_(
+            ImportJob.status == ImportJobStatus.queued,
+            and_(ImportJob.status == ImportJobStatus.running, ImportJob.heartbeat_at < func.now() - STALE_AFTER),
+        ))
+        .order_by(ImportJob.id)
+        .with_for_update(skip_locked=True)
+        .first()
+    )
+    if job is None:
+        db.rollback()
+        return None
+    job.status = ImportJobStatus.running
+    job.attempts += 1
+    job.started_at = job.started_at or func.now()
+    job.heartbeat_at = func.now()
+    db.commit()
+    return job
+
+
+def _write_errors(job: ImportJob, fieldnames: list, error_rows: list):
+    job.error_file = job.error_file or os.path.join(ERROR_DIR, f"errors_import_{job.id}.csv")
+    new_file = not os.path.exists(job.error_file)
+    with open(job.error_file, "a", newline="", encoding="utf-8") as err_file:
+        writer = csv.DictWriter(err_file, fieldnames=fieldnames + ["error"])
+        if new_file:
+            writer.writeheader()
+        writer.writerows(error_rows)
+    details = list(job.error_details or [])
+    if len(details) < ERROR_DETAILS_LIMIT:
+        job.error_details = details + error_rows[:ERROR_DETAILS_LIMIT - len(details)]
+
+
+def _heartbeat(job_id: int, stop: threading.Event):
+    while not stop.wait(HEARTBEAT_INTERVAL):
+        db = SessionLocal()
+        try:
+            db.query(ImportJob).filter(ImportJob.id == job_id, ImportJob.status == ImportJobStatus.running).update(
+                {ImportJob.heartbeat_at: func.now()}, synchronize_session=False
+            )
+            db.commit()
+        except Exception:
+            logger.exception("Import job heartbeat failed")
+        finally:
+            db.close()
+
+
+def run_job(db: Session, job: ImportJob):
+    if job.attempts > MAX_ATTEMPTS:
+        raise RuntimeError(f"Gave up after {MAX_ATTEMPTS} attempts")
+
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(job.id, stop), name=f"import-heartbeat-{job.id}", daemon=True)
+    heartbeat.start()
+    try:
+        _import(db, job)
+    finally:
+        stop.set()
+        heartbeat.join()
+
+
+def _import(db: Session, job: ImportJob):
+    image_dir = os.path.join(job.upload_dir, "images")
+    image_map = {name: os.path.join(image_dir, name) for name in os.listdir(image_dir)}
+    rows_done, success_done, errors_done = job.rows_processed, job.success_count, job.error_count
+
+    with open(os.path.join(job.upload_dir, "products.csv"), newline="", encoding="utf-8") as csv_file:
+        reader = csv.DictReader(csv_file)
+
+        def on_chunk(result):
+            if result["error_rows"]:
+                _write_errors(job, reader.fieldnames, result["error_rows"])
+                result["error_rows"].clear()
+            job.rows_processed = rows_done + result["rows_read"]
+            job.success_count = success_done + result["success_count"]
+            job.error_count = errors_done + result["error_count"]
+            job.heartbeat_at = func.now()
+
+        def on_commit(result):
+            # Per chunk, so nothing accumulates over a large feed
+            if result["product_ids"]:
+                invalidate_catalog(result["product_ids"], result["category_ids"], featured=result["featured"])
+            release_files(db, result["removed_image_urls"])
+            result["product_ids"].clear()
+            result["category_ids"].clear()
+            result["removed_image_urls"].clear()
+            result["featured"] = False
+
+        import_products(
+            db, islice(reader, rows_done, None), image_map, job.admin_id, save_image,
+            on_chunk=on_chunk, on_commit=on_commit, add_derivatives=add_derivatives,
+        )
+
+    job.status = ImportJobStatus.completed
+    job.message = f"{job.success_count} variants uploaded successfully"
+    job.finished_at = func.now()
+    db.commit()
+    shutil.rmtree(job.upload_dir, ignore_errors=True)
+
+
+def _worker():
+    while True:
+        db = SessionLocal()
+        job = None
+        try:
+            job = claim_job(db)
+            if job is not None:
+                run_job(db, job)
+        except Exception as e:
+            logger.exception("Import job failed")
+            db.rollback()
+            if job is not None:
+                try:
+                    job.status = ImportJobStatus.failed
+                    job.message = str(e)
+                    job.finished_at = func.now()
+                    db.commit()
+                except Exception:
+                    logger.exception("Could not mark import job as failed")
+        finally:
+            db.close()
+        if job is None:
+            _wake.wait(POLL_INTERVAL)
+            _wake.clear()
+
+
+_wake = threading.Event()
+_workers = []
+
+
+def start_workers():
+    if _workers:
+        return
+    for index in range(IMPORT_WORKERS):
+        worker = threading.Thread(target=_worker, name=f"import-worker-{index}", daemon=True)
+        worker.start()
+        _workers.append(worker)
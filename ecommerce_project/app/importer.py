@@ -0,0 +1,306 @@
+import json
+from itertools import islice
+from uuid import uuid4
+from sqlalchemy import delete, insert, or_, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from app.models import Category, Product, ProductVariant, ProductImage
+from app.catalog import refresh_price_bounds, bump_versions
+from app.stock import reset_shards
+
+IMPORT_CHUNK_SIZE = 1000
+
+REQUIRED_FIELDS = ["product_name", "brand", "is_feature", "category_id", "description",
+                   "price", "stock", "attributes", "image_filenames"]
+
+
+# Bulk product import. Rows are validated in Python, then written a chunk at
+# a time with multi-row INSERT ... RETURNING for products, variants and
+# images, one transaction per chunk. If a chunk fails in the database it is
+# replayed row by row under savepoints, so only the bad rows are rejected.
+# Rejected rows come back with an "error" column for the error CSV.
+#
+# Rows with a ``sku`` (product) and ``variant_sku`` column are upserted
+# instead: INSERT ... ON CONFLICT (sku) DO UPDATE, only where a value differs,
+# so reloading the same feed changes nothing and bumps no versions. Rows
+# without them are always inserted, grouped into products by name and
+# category.
+
+PRODUCT_FIELDS = ["product_name", "brand", "is_feature", "category_id", "description"]
+VARIANT_FIELDS = ["product_id", "price", "stock", "discount", "shipping_time", "attributes"]
+
+def parse_row(row: dict, category_ids: set, image_map: dict, save_image) -> dict:
+    for field in REQUIRED_FIELDS:
+        if not row.get(field):
+            raise ValueError(f"Missing required field '{field}'")
+
+    category_id = int(row["category_id"])
+    if category_id not in category_ids:
+        raise ValueError(f"Category ID {category_id} does not exist")
+
+    parsed = {
+        "product_name": row["product_name"].strip(),
+        "brand": row["brand"].strip(),
+        "is_feature": row["is_feature"].lower() == "true",
+        "category_id": category_id,
+        "description": row["description"].strip(),
+        "price": float(row["price"]),
+        "stock": int(row["stock"]),
+        "discount": int(row.get("discount", 0)),
+        "shipping_time": int(row.get("shipping_time", 0)),
+        "attributes": json.loads(row["attributes"]),
+        "sku": (row.get("sku") or "").strip() or None,
+        "variant_sku": (row.get("variant_sku") or "").strip() or None,
+    }
+    if not isinstance(parsed["attributes"], dict):
+        raise ValueError("attributes must be a JSON object")
+    if bool(parsed["sku"]) != bool(parsed["variant_sku"]):
+        raise ValueError("Give both sku and variant_sku, or neither")
+    image_filenames = [img.strip() for img in row["image_filenames"].split(",")]
+    for img_name in image_filenames:
+        if img_name not in image_map:
+            raise ValueError(f"Image file '{img_name}' not found in upload")
+    # save_image returns the product_images columns for the stored file;
+    # import_products may add their derivatives per chunk
+    parsed["images"] = [
+        save_image(image_map[img_name], parsed["product_name"], parsed["attributes"]) for img_name in image_filenames
+    ]
+    return parsed
+
+
+def _product_key(parsed: dict) -> tuple:
+    if parsed["sku"]:
+        return ("sku", parsed["sku"])
+    return parsed["product_name"], parsed["category_id"]
+
+
+def _upsert(model, fields: list, rows: list, *always):
+    """INSERT ... ON CONFLICT (sku) DO UPDATE, skipping rows where no field differs.
+
+    Rows matching any of the ``always`` conditions are updated regardless.
+    """
+    stmt = pg_insert(model).values(rows)
+    return stmt.on_conflict_do_update(
+        index_elements=[model.sku],
+        set_={field: stmt.excluded[field] for field in fields},
+        where=or_(*[getattr(model, field).is_distinct_from(stmt.excluded[field]) for field in fields], *always),
+    )
+
+
+def _upsert_rows(db: Session, rows: list, admin_id: int) -> tuple:
+    """Upsert SKU-keyed rows; returns (product ids by key, changed product ids, removed image URLs)."""
+    products = {}
+    for parsed in rows:
+        products.setdefault(parsed["sku"], parsed)
+    product_rows = db.execute(
+        _upsert(Product, PRODUCT_FIELDS, [
+            {"sku": sku, "admin_id": admin_id, **{field: parsed[field] for field in PRODUCT_FIELDS}}
+            for sku, parsed in products.items()
+        ]).returning(Product.sku, Product.id)
+    ).all()
+    product_ids = dict(product_rows)
+    changed = set(product_ids.values())
+    # Unchanged products are not returned by the upsert
+    missing = [sku for sku in products if sku not in product_ids]
+    if missing:
+        product_ids.update(db.execute(select(Product.sku, Product.id).where(Product.sku.in_(missing))).all())
+
+    variant_skus = [parsed["variant_sku"] for parsed in rows]
+    previous = {sku: (variant_id, product_id) for sku, variant_id, product_id in db.execute(
+        select(ProductVariant.sku, ProductVariant.id, ProductVariant.product_id).where(ProductVariant.sku.in_(variant_skus))
+    )}
+    variant_rows = db.execute(
+        _upsert(ProductVariant, VARIANT_FIELDS, [
+            {"sku": parsed["variant_sku"], "product_id": product_ids[parsed["sku"]],
+             **{field: parsed[field] for field in VARIANT_FIELDS[1:]}}
+            for parsed in rows
+        ], ProductVariant.stock_sharded)
+        .returning(ProductVariant.sku, ProductVariant.id, ProductVariant.product_id, ProductVariant.stock_sharded)
+    ).all()
+    variant_ids = {sku: variant_id for sku, variant_id, _, _ in variant_rows}
+    changed |= {product_id for _, _, product_id, _ in variant_rows}
+    # The feed's stock is the whole stock of a sharded variant
+    reset_shards(db, [variant_id for _, variant_id, _, sharded in variant_rows if sharded])
+    # A variant that moved to another product changes the old one too
+    changed |= {previous[sku][1] for sku in variant_ids if sku in previous}
+    variant_ids.update({sku: variant_id for sku, (variant_id, _) in previous.items() if sku not in variant_ids})
+
+    # Replace the images of variants whose image list differs
+    current = {}
+    for variant_id, image_url in db.execute(
+        select(ProductImage.variant_id, ProductImage.image_url)
+        .where(ProductImage.variant_id.in_(variant_ids.values()))
+        .order_by(ProductImage.id)
+    ):
+        current.setdefault(variant_id, []).append(image_url)
+    replaced = {}
+    for parsed in rows:
+        variant_id = variant_ids[parsed["variant_sku"]]
+        if current.get(variant_id, []) != [image["image_url"] for image in parsed["images"]]:
+            replaced[variant_id] = parsed
+    removed_urls = set()
+    if replaced:
+        removed_urls = {url for variant_id in replaced for url in current.get(variant_id, [])}
+        db.execute(delete(ProductImage).where(ProductImage.variant_id.in_(replaced)))
+        images = [{"variant_id": variant_id, **image} for variant_id, parsed in replaced.items() for image in parsed["images"]]
+        if images:
+            db.execute(insert(ProductImage), images)
+        changed |= {product_ids[parsed["sku"]] for parsed in replaced.values()}
+
+    refresh_price_bounds(db, changed)
+    bump_versions(db, changed)
+    return product_ids, changed, removed_urls
+
+
+def _insert_rows(db: Session, rows: list, product_ids: dict, admin_id: int) -> tuple:
+    """Insert the products missing from ``product_ids``, then variants and images.
+
+    SKU-keyed rows are upserted. Returns the product ids by product key for
+    the products created or upserted, the ids of products that changed, and
+    image URLs no longer used by the upserted variants.
+    """
+    keyed = [parsed for parsed in rows if parsed["sku"]]
+    rows = [parsed for parsed in rows if not parsed["sku"]]
+    created, changed, removed_urls = {}, set(), set()
+    if keyed:
+        upserted, changed, removed_urls = _upsert_rows(db, keyed, admin_id)
+        created = {("sku", sku): product_id for sku, product_id in upserted.items()}
+    if not rows:
+        return created, changed, removed_urls
+
+    new_products = {}
+    for parsed in rows:
+        new_products.setdefault(_product_key(parsed), parsed)
+    for key in product_ids:
+        new_products.pop(key, None)
+
+    if new_products:
+        ids = db.scalars(
+            insert(Product).returning(Product.id, sort_by_parameter_order=True),
+            [
+                {
+                    "sku": str(uuid4()),
+                    "product_name": parsed["product_name"],
+                    "brand": parsed["brand"],
+                    "is_feature": parsed["is_feature"],
+                    "category_id": parsed["category_id"],
+                    "description": parsed["description"],
+                    "admin_id": admin_id,
+                }
+                for parsed in new_products.values()
+            ],
+        ).all()
+        created.update(zip(new_products, ids))
+
+    row_product_ids = [product_ids.get(_product_key(parsed)) or created[_product_key(parsed)] for parsed in rows]
+    variant_ids = db.scalars(
+        insert(ProductVariant).returning(ProductVariant.id, sort_by_parameter_order=True),
+        [
+            {
+                "product_id": product_id,
+                "price": parsed["price"],
+                "stock": parsed["stock"],
+                "discount": parsed["discount"],
+                "shipping_time": parsed["shipping_time"],
+                "attributes": parsed["attributes"],
+            }
+            for parsed, product_id in zip(rows, row_product_ids)
+        ],
+    ).all()
+
+    images = [
+        {"variant_id": variant_id, **image}
+        for parsed, variant_id in zip(rows, variant_ids)
+        for image in parsed["images"]
+    ]
+    if images:
+        db.execute(insert(ProductImage), images)
+
+    refresh_price_bounds(db, set(row_product_ids))
+    changed |= set(row_product_ids)
+    return created, changed, removed_urls
+
+
+def import_products(db: Session, rows, image_map: dict, admin_id: int, save_image,
+                    on_chunk=None, on_commit=None, add_derivatives=None) -> dict:
+    """Import CSV rows (dicts) in chunks of IMPORT_CHUNK_SIZE.
+
+    ``add_derivatives(images)``, if given, is called once per chunk with the
+    product_images dicts of its valid rows, before they are written, to fill
+    in their ``derivatives`` in one batch.
+
+    ``on_chunk(result)`` is called inside each chunk's transaction, just
+    before it commits, so progress recorded there is atomic with the rows.
+    It may drain ``result["error_rows"]``. ``on_commit(result)`` is called
+    after each commit and may drain ``result["product_ids"]`` (products
+    created or changed, with their ``category_ids`` and ``featured``) and
+    ``result["removed_image_urls"]`` (URLs upserted variants stopped using,
+    for release_files). Drained, memory does not grow with the feed, except
+    for one id per product grouped by name, which later chunks may extend.
+    """
+    category_ids = {category_id for (category_id,) in db.query(Category.id)}
+    product_ids = {}
+    result = {"rows_read": 0, "success_count": 0, "error_count": 0, "error_rows": [],
+              "product_ids": set(), "category_ids": set(), "featured": False, "removed_image_urls": set()}
+
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, IMPORT_CHUNK_SIZE))
+        if not chunk:
+            break
+
+        parsed_rows, raw_rows, errors = [], [], []
+        for row in chunk:
+            try:
+                parsed_rows.append(parse_row(row, category_ids, image_map, save_image))
+                raw_rows.append(row)
+            except Exception as e:
+                row["error"] = str(e)
+                errors.append(row)
+        if add_derivatives:
+            add_derivatives([image for parsed in parsed_rows for image in parsed["images"]])
+
+        known = dict(product_ids)
+        committed, changed, removed_urls = [], set(), set()
+        if parsed_rows:
+            try:
+                created, changed, removed_urls = _insert_rows(db, parsed_rows, known, admin_id)
+                known.update(created)
+                committed = parsed_rows
+            except Exception:
+                db.rollback()
+                known = dict(product_ids)
+                changed, removed_urls = set(), set()
+                for parsed, row in zip(parsed_rows, raw_rows):
+                    try:
+                        with db.begin_nested():
+                            created, row_changed, row_removed = _insert_rows(db, [parsed], known, admin_id)
+                        known.update(created)
+                        changed |= row_changed
+                        removed_urls |= row_removed
+                        committed.append(parsed)
+                    except Exception as e:
+                        row["error"] = str(e)
+                        errors.append(row)
+
+        # Only products that actually changed need their caches invalidated
+        for parsed in committed:
+            if known[_product_key(parsed)] in changed:
+                result["category_ids"].add(parsed["category_id"])
+                result["featured"] = result["featured"] or parsed["is_feature"]
+        result["product_ids"] |= changed
+        result["removed_image_urls"] |= removed_urls
+        result["rows_read"] += len(chunk)
+        result["success_count"] += len(committed)
+        result["error_count"] += len(errors)
+        result["error_rows"].extend(errors)
+
+        if on_chunk:
+            on_chunk(result)
+        db.commit()
+        if on_commit:
+            on_commit(result)
+        # SKU-keyed products are found by the upsert itself in later chunks
+        product_ids = {key: product_id for key, product_id in known.items() if key[0] != "sku"}
+
+    return result
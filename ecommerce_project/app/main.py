@@ -18,6 +18,7 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 from app.routers.admin import router as admin_router
 from app.routers.categoryroute import router as category_router
 from app.routers.productroute import router as product_router
+from app.routers.sorting_product import router as sorting_router
 # from app.routers.cart import router as cart_router
 from app.routers.webhook import router as webhook_router
 from app.routers.payment import router as payment_router
@@ -25,12 +26,17 @@ from app.routers.orders import router as order_router
 from app.routers.reviews import router as review_router
 from app.routers.shipping_details import router as shippingdetails_router
 from app.rate_limiter import setup_rate_limiting
+from app.import_jobs import start_workers
+from app.stock import start_rebalancer
+from app.storage import ImmutableStaticFiles
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 
 
 app=FastAPI()
 
+# Content-addressed images never change under the same URL; mounted first so it wins over /media
+app.mount("/media/content", ImmutableStaticFiles(directory="media/content"), name="media_content")
 app.mount("/media", StaticFiles(directory="media"), name="media")
 
 
@@ -45,6 +51,11 @@ app.add_middleware(
 setup_rate_limiting(app)
 Base.metadata.create_all(bind=engine)
 
+@app.on_event("startup")
+def start_background_workers():
+    start_workers()
+    start_rebalancer()
+
 #register & login start
 @app.post("/register/")
 def register(user:UserCreate,background_tasks:BackgroundTasks,db:Session=Depends(get_db)):
@@ -154,6 +165,7 @@ async def reset_password(data: ResetPasswordRequest, db: Session = Depends(get_d
 app.include_router(profile_address.router, prefix="/user", tags=["User Profile & Address"])
 app.include_router(admin_router)
 app.include_router(product_router)
+app.include_router(sorting_router)
 app.include_router(category_router)
 app.include_router(review_router)
 # app.include_router(cart_router)
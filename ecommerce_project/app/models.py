@@ -1,9 +1,10 @@
-from sqlalchemy import Column, Integer, String, JSON, Boolean,TIMESTAMP, text, Enum, Date, ForeignKey, Float, DateTime, Text
+from sqlalchemy import Column, Integer, String, JSON, Boolean,TIMESTAMP, text, Enum, Date, ForeignKey, Float, DateTime, Text, Index
 from app.database import Base
 from sqlalchemy.sql import func
 from datetime import datetime
 import enum
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, column_property
+from sqlalchemy import UniqueConstraint, case, select
 from pydantic import ConfigDict
 
 # Enums
@@ -102,7 +103,8 @@ class CategoryVariantAttribute(Base):
     category = relationship("Category", back_populates="variant_attributes")
     attribute = relationship("VariantAttribute", back_populates="categories")
 
-from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR, JSONB
+from sqlalchemy import DDL, event
 # Product Table 
 class Product(Base):
     __tablename__ = "products"
@@ -117,22 +119,88 @@ class Product(Base):
     is_feature = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Bumped on every change to the product, its variants or images (ETag validator)
+    version = Column(Integer, nullable=False, default=1, server_default=text("1"))
+    # Review aggregates, kept in step with the reviews table by app/ratings.py
+    avg_rating = Column(Float, nullable=False, default=0, server_default=text("0"))
+    review_count = Column(Integer, nullable=False, default=0, server_default=text("0"))
+    rating_1_count = Column(Integer, nullable=False, default=0, server_default=text("0"))
+    rating_2_count = Column(Integer, nullable=False, default=0, server_default=text("0"))
+    rating_3_count = Column(Integer, nullable=False, default=0, server_default=text("0"))
+    rating_4_count = Column(Integer, nullable=False, default=0, server_default=text("0"))
+    rating_5_count = Column(Integer, nullable=False, default=0, server_default=text("0"))
+    # Price after discount across the product's variants, and units ordered;
+    # maintained by app/catalog.py for sorting and price filtering
+    min_effective_price = Column(Float, nullable=True)
+    max_effective_price = Column(Float, nullable=True, index=True)
+    units_sold = Column(Integer, nullable=False, default=0, server_default=text("0"))
+    # Full-text document, maintained by the database trigger below
+    search_vector = Column(TSVECTOR, nullable=True)
 
     # Relationships
     category = relationship("Category", back_populates="products")
     admin = relationship("User", back_populates="products")
-    variants = relationship("ProductVariant", back_populates="product", cascade="all, delete-orphan")
+    variants = relationship("ProductVariant", back_populates="product", cascade="all, delete-orphan", order_by="ProductVariant.id")
     reviews = relationship("Review", back_populates="product")
     order_items = relationship("OrderItem", back_populates="product")
 
+    # Keyset pagination indexes, see app/catalog.py
+    __table_args__ = (
+        Index("ix_products_created_at_id", "created_at", "id"),
+        Index("ix_products_category_id_created_at_id", "category_id", "created_at", "id"),
+        Index("ix_products_search_vector", "search_vector", postgresql_using="gin"),
+        # Sort keys for /sort, each with id as the keyset tie-breaker
+        Index("ix_products_min_effective_price_id", "min_effective_price", "id"),
+        Index("ix_products_avg_rating_id", "avg_rating", "id"),
+        Index("ix_products_units_sold_id", "units_sold", "id"),
+    )
+
+# Keep products.search_vector current: product name and brand rank highest,
+# then the category name, then the description. Renaming a category
+# re-touches its products. Mirrors Alembic revision 094dd70f32cc.
+PRODUCT_SEARCH_TRIGGERS = """
+CREATE OR REPLACE FUNCTION products_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('english', coalesce(NEW.product_name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(NEW.brand, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(
+            (SELECT category_name FROM categories WHERE id = NEW.category_id), '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(NEW.description, '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER products_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF product_name, brand, description, category_id ON products
+    FOR EACH ROW EXECUTE FUNCTION products_search_vector_update();
+
+CREATE OR REPLACE FUNCTION categories_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    UPDATE products SET category_id = category_id WHERE category_id = NEW.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER categories_search_vector_trigger
+    AFTER UPDATE OF category_name ON categories
+    FOR EACH ROW WHEN (OLD.category_name IS DISTINCT FROM NEW.category_name)
+    EXECUTE FUNCTION categories_search_vector_update();
+"""
+event.listen(Product.__table__, "after_create", DDL(PRODUCT_SEARCH_TRIGGERS).execute_if(dialect="postgresql"))
+
    
 # PorductImage Table
 class ProductImage(Base):
     __tablename__ = "product_images"
 
     id = Column(Integer, primary_key=True, index=True)
-    variant_id = Column(Integer, ForeignKey("product_variants.id", ondelete="CASCADE"))
-    image_url = Column(String, nullable=False)
+    variant_id = Column(Integer, ForeignKey("product_variants.id", ondelete="CASCADE"), index=True)
+    # Indexed: content-addressed files are reference counted by URL (app/storage.py)
+    image_url = Column(String, nullable=False, index=True)
+    # Resized WebP/JPEG copies by size name, built by app/images.py.
+    # SQL NULL: not built yet; JSON null: the file is not a readable image
+    derivatives = Column(JSON, nullable=True)
 
     # Relationship
     variant = relationship("ProductVariant", back_populates="images")
@@ -142,19 +210,87 @@ class ProductVariant(Base):
     __tablename__ = "product_variants"
 
     id = Column(Integer, primary_key=True, index=True)
-    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"))
+    product_id = Column(Integer, ForeignKey("products.id", ondelete="CASCADE"), index=True)
+    # Merchant/ERP identifier, used by the bulk price and stock update
+    sku = Column(String, unique=True, nullable=True)
 
     price = Column(Float, nullable=False)
     stock = Column(Integer, nullable=False)
     discount = Column(Integer, default=0)
     shipping_time = Column(Integer, nullable=True)
-    attributes = Column(JSON, nullable=True, default={})
-
+    attributes = Column(JSONB, nullable=True, default={})
+    # Stock split over variant_stock_shards rows, see app/stock.py; `stock`
+    # then only holds what the rebalancer has not handed out yet
+    stock_sharded = Column(Boolean, nullable=False, default=False, server_default=text("false"))
+    # Units sold at checkout not yet added to products.units_sold, see app/stock.py
+    sold = Column(Integer, nullable=False, default=0, server_default=text("0"))
 
     # Relationships
     product = relationship("Product", back_populates="variants")
     order_items = relationship("OrderItem", back_populates="variant")
-    images = relationship("ProductImage", back_populates="variant", cascade="all, delete-orphan")
+    images = relationship("ProductImage", back_populates="variant", cascade="all, delete-orphan", order_by="ProductImage.id")
+
+    # Containment (@>) lookups for attribute filtering, see /products/filter
+    __table_args__ = (
+        Index("ix_product_variants_attributes", "attributes", postgresql_using="gin",
+              postgresql_ops={"attributes": "jsonb_path_ops"}),
+        Index("ix_product_variants_sold_pending", "id", postgresql_where=text("sold <> 0")),
+    )
+
+# Stock buckets of a sharded variant: checkouts decrement one bucket instead
+# of all queueing on the product_variants row
+class VariantStockShard(Base):
+    __tablename__ = "variant_stock_shards"
+
+    id = Column(Integer, primary_key=True)
+    variant_id = Column(Integer, ForeignKey("product_variants.id", ondelete="CASCADE"), nullable=False)
+    shard_no = Column(Integer, nullable=False)
+    stock = Column(Integer, nullable=False, default=0, server_default=text("0"))
+    # Units taken from this bucket not yet added to products.units_sold
+    sold = Column(Integer, nullable=False, default=0, server_default=text("0"))
+
+    __table_args__ = (
+        UniqueConstraint("variant_id", "shard_no"),
+    )
+
+# What can be sold: the row's stock plus, for sharded variants, its buckets
+ProductVariant.available_stock = column_property(
+    ProductVariant.stock + case(
+        (ProductVariant.stock_sharded, func.coalesce(
+            select(func.sum(VariantStockShard.stock))
+            .where(VariantStockShard.variant_id == ProductVariant.id)
+            .correlate_except(VariantStockShard)
+            .scalar_subquery(), 0)),
+        else_=0,
+    )
+)
+
+class ImportJobStatus(str, enum.Enum):
+    queued = "queued"
+    running = "running"
+    completed = "completed"
+    failed = "failed"
+
+# Bulk product import, run by the worker in app/import_jobs.py
+class ImportJob(Base):
+    __tablename__ = "import_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    admin_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
+    status = Column(Enum(ImportJobStatus), nullable=False, default=ImportJobStatus.queued, index=True)
+    # CSV and images are stored under media/imports/<id>/ until the job is done
+    upload_dir = Column(String, nullable=True)
+    rows_processed = Column(Integer, nullable=False, default=0, server_default=text("0"))
+    success_count = Column(Integer, nullable=False, default=0, server_default=text("0"))
+    error_count = Column(Integer, nullable=False, default=0, server_default=text("0"))
+    error_file = Column(String, nullable=True)
+    error_details = Column(JSON, nullable=True)
+    message = Column(Text, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0, server_default=text("0"))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
 
 # Cart Table
 # class Cart(Base):
@@ -235,13 +371,20 @@ class Order(Base):
         shipping_details = relationship("ShippingDetails", back_populates="order", uselist=False)
         refunds = relationship("Refund", back_populates="order", cascade="all, delete")
         coupon = relationship("Coupon", back_populates="orders", uselist=False)
+
+        # Keyset order listings, see app/order_listing.py
+        __table_args__ = (
+            Index("ix_orders_created_timestamp_id", created_timestamp.desc(), id.desc()),
+            Index("ix_orders_user_id_created_timestamp_id", user_id, created_timestamp.desc(), id.desc()),
+            Index("ix_orders_order_status_created_timestamp_id", order_status, created_timestamp.desc(), id.desc()),
+        )
 from sqlalchemy.sql import func
     # Order Item Table
 class OrderItem(Base):
         __tablename__ = "order_items"
         
         id = Column(Integer, primary_key=True, index=True)
-        order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+        order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
         product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
         variant_id = Column(Integer, ForeignKey("product_variants.id"), nullable=False)
 
@@ -0,0 +1,144 @@
+import json
+from datetime import datetime
+from fastapi import HTTPException, Query
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.orm import selectinload
+from app.database import SessionLocal
+from app.models import Order, OrderItem, Payment, User
+from app.schemas import OrderStatus
+from app.catalog import encode_cursor, decode_cursor
+
+ORDER_PAGE_SIZE = 20
+MAX_ORDER_PAGE_SIZE = 100
+MAX_SUMMARY_PAGE_SIZE = 1000
+
+
+# Order listings, newest first, paged by keyset over (created_timestamp, id)
+# like the product listings in app/catalog.py. The filters line up with the
+# composite indexes on orders, so a page costs the same at any depth and
+# whatever the total number of orders.
+
+class OrderFilters:
+    """Query parameters shared by the customer and admin order listings."""
+
+    def __init__(
+        self,
+        status: OrderStatus | None = Query(None),
+        date_from: datetime | None = Query(None, description="Orders created at or after"),
+        date_to: datetime | None = Query(None, description="Orders created before"),
+        min_amount: float | None = Query(None, ge=0, description="Minimum final amount"),
+        max_amount: float | None = Query(None, ge=0, description="Maximum final amount"),
+        user_id: int | None = Query(None, description="Admins only"),
+    ):
+        if min_amount is not None and max_amount is not None and min_amount > max_amount:
+            raise HTTPException(status_code=400, detail="min_amount cannot be greater than max_amount")
+        if date_from is not None and date_to is not None and date_from > date_to:
+            raise HTTPException(status_code=400, detail="date_from cannot be after date_to")
+        self.status = status
+        self.date_from = date_from
+        self.date_to = date_to
+        self.min_amount = min_amount
+        self.max_amount = max_amount
+        self.user_id = user_id
+
+    def conditions(self) -> list:
+        conditions = []
+        if self.status is not None:
+            conditions.append(Order.order_status == self.status.value)
+        if self.user_id is not None:
+            conditions.append(Order.user_id == self.user_id)
+        if self.date_from is not None:
+            conditions.append(Order.created_timestamp >= self.date_from)
+        if self.date_to is not None:
+            conditions.append(Order.created_timestamp < self.date_to)
+        if self.min_amount is not None:
+            conditions.append(Order.final_amount >= self.min_amount)
+        if self.max_amount is not None:
+            conditions.append(Order.final_amount <= self.max_amount)
+        return conditions
+
+
+def _after_cursor(cursor: str):
+    try:
+        created_timestamp, order_id = decode_cursor(cursor)
+        created_timestamp, order_id = datetime.fromisoformat(created_timestamp), int(order_id)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return tuple_(Order.created_timestamp, Order.id) < (created_timestamp, order_id)
+
+
+def paginate_orders(db, conditions: list, cursor: str | None, limit: int):
+    """One page of orders with their items and user loaded; returns (orders, next_cursor)."""
+    query = (
+        db.query(Order)
+        .options(selectinload(Order.order_items), selectinload(Order.user))
+        .filter(*conditions)
+        .order_by(Order.created_timestamp.desc(), Order.id.desc())
+    )
+    if cursor:
+        query = query.filter(_after_cursor(cursor))
+
+    orders = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(orders) > limit:
+        orders = orders[:limit]
+        next_cursor = encode_cursor(orders[-1].created_timestamp, orders[-1].id)
+    return orders, next_cursor
+
+
+# Dashboard summaries: a single Core select of the few columns a dashboard
+# shows, rows serialized as they come without building ORM objects. Item
+# counts are a correlated count over order_items.order_id.
+
+SUMMARY_COLUMNS = ["id", "order_date", "created_timestamp", "order_status", "final_amount",
+                   "customer_name", "payment_status", "item_count"]
+SUMMARY_BATCH_SIZE = 5000
+
+
+def summary_select(conditions: list):
+    item_count = (
+        select(func.count()).where(OrderItem.order_id == Order.id).correlate(Order).scalar_subquery()
+    )
+    return (
+        select(Order.id, Order.order_date, Order.created_timestamp, Order.order_status, Order.final_amount,
+               User.name, Payment.status, item_count)
+        .join(User, User.id == Order.user_id)
+        .outerjoin(Payment, Payment.order_id == Order.id)
+        .where(*conditions)
+        .order_by(Order.created_timestamp.desc(), Order.id.desc())
+    )
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def summary_page(db, conditions: list, cursor: str | None, limit: int) -> str:
+    """A JSON document {"columns": [...], "rows": [[...], ...], "next_cursor": ...}."""
+    stmt = summary_select(conditions)
+    if cursor:
+        stmt = stmt.where(_after_cursor(cursor))
+
+    rows = [tuple(row) for row in db.execute(stmt.limit(limit + 1))]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][2], rows[-1][0])
+    return json.dumps({"columns": SUMMARY_COLUMNS, "rows": rows, "next_cursor": next_cursor}, default=_json_default)
+
+
+def iter_summary_ndjson(conditions: list):
+    """Every matching order as one JSON object per line, read through a server-side cursor.
+
+    Opens its own session: FastAPI closes dependency sessions before a
+    StreamingResponse body is sent.
+    """
+    db = SessionLocal()
+    try:
+        result = db.execute(summary_select(conditions).execution_options(yield_per=SUMMARY_BATCH_SIZE))
+        for rows in result.partitions():
+            yield "".join(json.dumps(dict(zip(SUMMARY_COLUMNS, row)), default=_json_default) + "\n" for row in rows)
+    finally:
+        db.close()
@@ -0,0 +1,98 @@
+import argparse
+from sqlalchemy import Float, cast, func, select, or_
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models import Product, Review
+
+STARS = (1, 2, 3, 4, 5)
+RATING_COLUMNS = {star: getattr(Product, f"rating_{star}_count") for star in STARS}
+
+
+# Incremental maintenance. Callers run this in the same transaction as the
+# review insert/update/delete; the UPDATE is relative to the stored counts,
+# so concurrent reviews of one product serialize on its row lock.
+
+def apply_rating_change(db: Session, product_id: int, removed: int | None = None, added: int | None = None):
+    deltas = {star: 0 for star in STARS}
+    if removed is not None:
+        deltas[removed] -= 1
+    if added is not None:
+        deltas[added] += 1
+    if not any(deltas.values()):
+        return
+
+    counts = {star: RATING_COLUMNS[star] + deltas[star] for star in STARS}
+    review_count = sum(counts.values())
+    rating_total = sum(star * counts[star] for star in STARS)
+
+    values = {RATING_COLUMNS[star]: counts[star] for star in STARS if deltas[star]}
+    values[Product.review_count] = review_count
+    values[Product.avg_rating] = func.coalesce(cast(rating_total, Float) / func.nullif(review_count, 0), 0)
+    db.query(Product).filter(Product.id == product_id).update(values, synchronize_session=False)
+
+
+# Backfill and consistency repair
+
+def _review_stats():
+    return (
+        select(
+            Review.product_id,
+            func.count(Review.id).label("review_count"),
+            func.coalesce(func.avg(Review.rating), 0).label("avg_rating"),
+            *[func.count(Review.id).filter(Review.rating == star).label(f"rating_{star}_count") for star in STARS],
+        )
+        .group_by(Review.product_id)
+        .subquery()
+    )
+
+
+def find_inconsistent(db: Session) -> list[int]:
+    stats = _review_stats()
+    stored = [Product.review_count] + [RATING_COLUMNS[star] for star in STARS]
+    computed = [stats.c.review_count] + [stats.c[f"rating_{star}_count"] for star in STARS]
+    mismatch = [func.coalesce(c, 0) != s for s, c in zip(stored, computed)]
+    query = (
+        select(Product.id)
+        .outerjoin(stats, stats.c.product_id == Product.id)
+        .where(or_(*mismatch))
+        .order_by(Product.id)
+    )
+    return list(db.scalars(query))
+
+
+def recompute_rating_aggregates(db: Session, product_ids=None) -> int:
+    """Rebuild the aggregates from the reviews table; returns rows updated."""
+    stats = _review_stats()
+    columns = ["review_count", "avg_rating"] + [f"rating_{star}_count" for star in STARS]
+
+    def scalar(name):
+        return select(stats.c[name]).where(stats.c.product_id == Product.id).scalar_subquery()
+
+    query = db.query(Product)
+    if product_ids is not None:
+        query = query.filter(Product.id.in_(list(product_ids)))
+    updated = query.update(
+        {getattr(Product, name): func.coalesce(scalar(name), 0) for name in columns},
+        synchronize_session=False,
+    )
+    db.commit()
+    return updated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill or repair product rating aggregates")
+    parser.add_argument("--check", action="store_true", help="only report products whose aggregates are out of date")
+    parser.add_argument("--repair", action="store_true", help="recompute only products whose aggregates are out of date")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.check or args.repair:
+            product_ids = find_inconsistent(db)
+            print(f"{len(product_ids)} products with inconsistent rating aggregates")
+            if args.repair and product_ids:
+                print(f"repaired {recompute_rating_aggregates(db, product_ids)} products")
+        else:
+            print(f"backfilled {recompute_rating_aggregates(db)} products")
+    finally:
+        db.close()
@@ -1,12 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from app.schemas import  UserCreate
 from app.auth import get_current_user
 from app.utils import pwd_context
-from typing import List
+from typing import List, Optional
 from app.database import get_db
 from app.models import User, Product, Order, Category, Refund, Review
-from app.schemas import ProductCreate, OrderUpdate, CategoryResponse, RefundResponse, ReviewResponse, ReviewUpdate
+from app.schemas import ProductCreate, OrderUpdate, CategoryResponse, RefundResponse, ReviewResponse, ReviewUpdate, ProductBulkDelete, StockShardsUpdate, OrderResponse
+from app.cache import catalog_cache
+from app.ratings import apply_rating_change
+from app.bulk_update import read_entries, apply_chunk, BULK_CHUNK_SIZE, MAX_BULK_ENTRIES
+from app.bulk_delete import product_filter, delete_products, release_orphaned_files
+from app.stock import configure_shards, restock_order
+from app.order_listing import (
+    OrderFilters, paginate_orders, summary_page, iter_summary_ndjson,
+    ORDER_PAGE_SIZE, MAX_ORDER_PAGE_SIZE, MAX_SUMMARY_PAGE_SIZE,
+)
+from app.models import ProductVariant, VariantStockShard
 router=APIRouter()
 
 router = APIRouter(prefix="/admin", tags=["Admin Panel"])
@@ -61,20 +73,124 @@ def get_categories(db: Session = Depends(get_db)):
     categories = db.query(Category).all()
     return categories
 #Product Management
+@router.post("/variants/bulk-update")
+async def bulk_update_variants(request: Request, admin: User = Depends(admin_required), db: Session = Depends(get_db)):
+    """Set price/stock/discount on many variants; JSON array, NDJSON or CSV body.
+
+    Entries are applied in chunks of BULK_CHUNK_SIZE, each committed on its
+    own, and every entry gets an outcome: updated, unchanged, not_found,
+    invalid or skipped (a later entry for the same variant won).
+    """
+    results, chunk = [], []
+    async for entry in read_entries(request):
+        if len(results) + len(chunk) >= MAX_BULK_ENTRIES:
+            raise HTTPException(status_code=413, detail=f"At most {MAX_BULK_ENTRIES} entries per request; "
+                                                        f"{len(results)} were applied")
+        chunk.append(entry)
+        if len(chunk) == BULK_CHUNK_SIZE:
+            results.extend(await run_in_threadpool(apply_chunk, db, chunk, len(results)))
+            chunk = []
+    if chunk:
+        results.extend(await run_in_threadpool(apply_chunk, db, chunk, len(results)))
+
+    counts = {}
+    for outcome in results:
+        counts[outcome["status"]] = counts.get(outcome["status"], 0) + 1
+    return {"total": len(results), "counts": counts, "results": results}
+
+
+@router.put("/variants/{variant_id}/stock-shards")
+def set_stock_shards(variant_id: int, payload: StockShardsUpdate, admin: User = Depends(admin_required),
+                     db: Session = Depends(get_db)):
+    """Spread a hot variant's stock over buckets so checkouts don't queue on one row."""
+    if not db.query(ProductVariant.id).filter(ProductVariant.id == variant_id).first():
+        raise HTTPException(status_code=404, detail="Variant not found")
+    configure_shards(db, variant_id, payload.shards)
+    db.commit()
+    variant = db.query(ProductVariant).filter(ProductVariant.id == variant_id).one()
+    buckets = (db.query(VariantStockShard.stock).filter(VariantStockShard.variant_id == variant_id)
+               .order_by(VariantStockShard.shard_no).all())
+    return {
+        "variant_id": variant_id,
+        "shards": payload.shards,
+        "available_stock": variant.available_stock,
+        "pool": variant.stock,
+        "buckets": [stock for (stock,) in buckets],
+    }
+
+
+@router.post("/products/bulk-delete")
+def bulk_delete_products(payload: ProductBulkDelete, background_tasks: BackgroundTasks,
+                         admin: User = Depends(admin_required), db: Session = Depends(get_db)):
+    """Delete products by id, brand and/or category.
+
+    Products with orders are kept (has_orders); products locked by other
+    requests are skipped (busy) and can be retried.
+    """
+    conditions = product_filter(payload.product_ids, payload.brand, payload.category_id)
+    if not conditions:
+        raise HTTPException(status_code=400, detail="Give product_ids, brand or category_id")
+    result = delete_products(db, conditions)
+    background_tasks.add_task(release_orphaned_files, result.pop("image_urls"))
+
+    if payload.product_ids is not None:
+        seen = set(result["deleted"]) | set(result["busy"]) | set(result["has_orders"])
+        result["not_found"] = sorted(set(payload.product_ids) - seen)
+    result["deleted_count"] = len(result["deleted"])
+    return result
+
+
+# Catalog read cache counters
+@router.get("/cache-stats")
+def get_cache_stats(admin: User = Depends(admin_required)):
+    return catalog_cache.stats()
 
 #Order Management
 @router.get("/orders")
-def get_orders(admin: User = Depends(admin_required), db: Session = Depends(get_db)):
-    orders = db.query(Order).all()
-    return {"orders": orders}
+def get_orders(
+    filters: OrderFilters = Depends(),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(ORDER_PAGE_SIZE, ge=1, le=MAX_ORDER_PAGE_SIZE),
+    admin: User = Depends(admin_required),
+    db: Session = Depends(get_db)
+):
+    orders, next_cursor = paginate_orders(db, filters.conditions(), cursor, limit)
+    return {
+        "orders": [OrderResponse.model_validate(order, from_attributes=True) for order in orders],
+        "next_cursor": next_cursor,
+    }
+
+# Dashboard summary: plain rows, no ORM objects
+@router.get("/orders/summary")
+def get_orders_summary(
+    filters: OrderFilters = Depends(),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(100, ge=1, le=MAX_SUMMARY_PAGE_SIZE),
+    admin: User = Depends(admin_required),
+    db: Session = Depends(get_db)
+):
+    return Response(summary_page(db, filters.conditions(), cursor, limit), media_type="application/json")
+
+
+@router.get("/orders/summary.ndjson")
+def export_orders_summary(filters: OrderFilters = Depends(), admin: User = Depends(admin_required)):
+    return StreamingResponse(iter_summary_ndjson(filters.conditions()), media_type="application/x-ndjson")
+
 # Get single Order by ID with Items
 @router.put("/orders/{order_id}")
 def update_order_status(order_id: int, order_update: OrderUpdate, admin: User = Depends(admin_required), db: Session = Depends(get_db)):
-    order = db.query(Order).filter(Order.id == order_id).first()
+    # Locked like a customer cancel, so stock is returned exactly once
+    order = db.query(Order).filter(Order.id == order_id).with_for_update().first()
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
 
-    order.order_status = order_update.order_status
+    if order_update.order_status is not None and order_update.order_status != order.order_status:
+        if order.order_status == "cancelled":
+            db.rollback()
+            raise HTTPException(status_code=400, detail="A cancelled order cannot be reopened")
+        if order_update.order_status == "cancelled":
+            restock_order(db, order)
+        order.order_status = order_update.order_status
     db.commit()
     db.refresh(order)
     return {"msg": "Order status updated successfully", "order": order}
@@ -96,11 +212,14 @@ def update_review(review_id: int, review_data: ReviewUpdate, admin: User = Depen
     if not review:
         raise HTTPException(status_code=404, detail="Review not found")
 
-    review.content = review_data.content
-    review.rating = review_data.rating
+    if review_data.description is not None:
+        review.description = review_data.description
+    if review_data.rating is not None and review_data.rating != review.rating:
+        apply_rating_change(db, review.product_id, removed=review.rating, added=review_data.rating)
+        review.rating = review_data.rating
     db.commit()
     db.refresh(review)
-    return {"msg": "Review updated successfully", "review": review}
+    return review
 
 # Delete reviews by admin
 @router.delete("/reviews/{review_id}")
@@ -108,6 +227,7 @@ def delete_review(review_id: int, admin: User = Depends(admin_required), db: Ses
     review = db.query(Review).filter(Review.id == review_id).first()
     if not review: 
         raise HTTPException(status_code=404, detail="Review not found")
+    apply_rating_change(db, review.product_id, removed=review.rating)
     db.delete(review)   
     db.commit()  
     return {"msg": "Review deleted successfully"}
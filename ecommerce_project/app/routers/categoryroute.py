@@ -1,30 +1,44 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 from app.auth import get_current_user
 from app.utils import pwd_context
 from app.database import get_db
-from app.models import Category
+from app.models import Category, Product
+from app.catalog import invalidate_catalog, make_etag, not_modified, not_modified_response, CACHE_CONTROL
 from typing import List
 from app.schemas import  CategoryResponse, CategoryCreate,CategoryUpdate
 router=APIRouter()
 router = APIRouter(prefix="/category", tags=["Category List"])
 # Public: Get all categories 
 @router.get("/categories", response_model=list[CategoryResponse])
-def get_categories(db: Session = Depends(get_db)):
+def get_categories(request: Request, response: Response, db: Session = Depends(get_db)):
     categories=db.query(Category).all()
     if not categories:
         raise HTTPException(status_code=404, detail="No category found")
+    # Categories are tiny, so the validator is a hash of the rows themselves
+    etag = make_etag("categories", [(c.id, c.category_name, c.description) for c in categories])
+    if not_modified(request, etag):
+        return not_modified_response(etag, CACHE_CONTROL["category"])
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL["category"]
     return categories
 
 # Get categories by ID
 @router.get("/{category_id}", response_model=List[CategoryResponse])
 def get_categories(
     category_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db)
 ):
     categories = db.query(Category).filter(Category.id == category_id).all()
     if not categories:
         raise HTTPException(status_code=404, detail="No category found")
+    etag = make_etag("category", [(c.id, c.category_name, c.description) for c in categories])
+    if not_modified(request, etag):
+        return not_modified_response(etag, CACHE_CONTROL["category"])
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL["category"]
     return categories
 
 # Admin: Create a new category
@@ -74,7 +88,9 @@ def delete_category(category_id: int, db: Session = Depends(get_db), current_use
     category = db.query(Category).filter(Category.id == category_id).first()
     if not category:
         raise HTTPException(status_code=404, detail="Category not found.")
+    product_ids = [product_id for (product_id,) in db.query(Product.id).filter(Product.category_id == category_id)]
 
     db.delete(category)
     db.commit()
+    invalidate_catalog(product_ids, [category_id])
     return {"message": "Category deleted successfully"}
\ No newline at end of file
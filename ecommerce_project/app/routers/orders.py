@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.orm import Session, selectinload
-from typing import List
+from typing import List, Optional, Union
 from datetime import datetime, timedelta
 from app import models, schemas
 from app.database import get_db
 from app.auth import get_current_user
+from app.stock import reserve_stock, restock_order
+from app.order_listing import OrderFilters, paginate_orders, ORDER_PAGE_SIZE, MAX_ORDER_PAGE_SIZE
 import stripe
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
@@ -19,93 +21,119 @@ def create_order(
     current_user: models.User = Depends(get_current_user)
 ):
 
-    total_amount = 0
-    item_details = []
-    max_shipping_days = 0
+    # Orders start out pending; only the cancel endpoint and admins move them on
+    if order_data.order_status != schemas.OrderStatus.pending:
+        raise HTTPException(status_code=400, detail="New orders must be pending")
 
+    # One query for every variant in the cart
+    quantities = {}
     for item in order_data.order_items:
-        variant = db.query(models.ProductVariant).filter(models.ProductVariant.id == item.variant_id).first()
-        if not variant:
-            raise HTTPException(status_code=404, detail=f"Variant ID {item.variant_id} not found")
-
-        price = float(variant.price)
-        discount_percent = variant.discount or 0
-        discounted_price = price * (1 - discount_percent / 100)
-        item_total = discounted_price * item.quantity
-        total_amount += item_total
-
-        if variant.shipping_time and variant.shipping_time > max_shipping_days:
-            max_shipping_days = variant.shipping_time
-
-        item_details.append({
-            "product_id": item.product_id,
-            "variant_id": item.variant_id,
-            "mrp": price,
-            "quantity": item.quantity,
-            "total_price": round(item_total, 2)
-        })
-
-    # ---- Apply coupon if exists ----
-    coupon_discount_amount = 0
+        quantities[item.variant_id] = quantities.get(item.variant_id, 0) + item.quantity
+    variants = {
+        variant.id: variant
+        for variant in db.query(models.ProductVariant).filter(models.ProductVariant.id.in_(quantities))
+    }
+    missing = sorted(quantities.keys() - variants.keys())
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Variant ID {missing[0]} not found")
+
+    # Checked before any stock is reserved
     coupon_obj = None
     if order_data.coupon_id:
         coupon_obj = db.query(models.Coupon).filter(models.Coupon.id == order_data.coupon_id, models.Coupon.is_active == True).first()
         if not coupon_obj:
             raise HTTPException(status_code=400, detail="Invalid or expired coupon")
 
-        if coupon_obj.discount_type == "percentage":
-            coupon_discount_amount = total_amount * (coupon_obj.discount_value / 100)
-        elif coupon_obj.discount_type == "fixed":
-            coupon_discount_amount = coupon_obj.discount_value
-
-    final_amount = total_amount - coupon_discount_amount
-    if final_amount < 0:
-        final_amount = 0
-
-    order_date = datetime.utcnow()
-    shipping_date = order_date + timedelta(days=max_shipping_days)
-
-    # ---- Create Order ----
-    new_order = models.Order(
-        order_date=order_date,
-        order_amount=round(total_amount, 2),
-        shipping_date=shipping_date,
-        order_status=order_data.order_status,
-        coupon_id=order_data.coupon_id,
-        discount_amount=round(coupon_discount_amount, 2),
-        final_amount=round(final_amount, 2),
-        user_id=current_user.id  
-  
-    )
-    db.add(new_order)
-    db.commit()
-    db.refresh(new_order)
-
-
-    # ---- Create Order Items ----
-    for item in item_details:
-        order_item = models.OrderItem(
-            order_id=new_order.id,
-            product_id=item["product_id"],
-            variant_id=item["variant_id"],
-            mrp=item["mrp"],
-            quantity=item["quantity"],
-            total_price=item["total_price"]
+    sharded = {variant.id for variant in variants.values() if variant.stock_sharded}
+    short = reserve_stock(db, quantities, sharded)
+    if short:
+        db.rollback()
+        raise HTTPException(status_code=409, detail=f"Insufficient stock for variant ID {short[0]}")
+
+    try:
+        total_amount = 0
+        order_items = []
+        max_shipping_days = 0
+
+        for item in order_data.order_items:
+            variant = variants[item.variant_id]
+            price = float(variant.price)
+            discount_percent = variant.discount or 0
+            discounted_price = price * (1 - discount_percent / 100)
+            item_total = discounted_price * item.quantity
+            total_amount += item_total
+
+            if variant.shipping_time and variant.shipping_time > max_shipping_days:
+                max_shipping_days = variant.shipping_time
+
+            # The variant decides the product, whatever the client sent
+            order_items.append(models.OrderItem(
+                product_id=variant.product_id,
+                variant_id=variant.id,
+                mrp=price,
+                quantity=item.quantity,
+                total_price=round(item_total, 2)
+            ))
+
+        # ---- Apply coupon if exists ----
+        coupon_discount_amount = 0
+        if coupon_obj:
+            if coupon_obj.discount_type == "percentage":
+                coupon_discount_amount = total_amount * (coupon_obj.discount_value / 100)
+            elif coupon_obj.discount_type == "fixed":
+                coupon_discount_amount = coupon_obj.discount_value
+
+        final_amount = total_amount - coupon_discount_amount
+        if final_amount < 0:
+            final_amount = 0
+
+        order_date = datetime.utcnow()
+        shipping_date = order_date + timedelta(days=max_shipping_days)
+
+        # ---- Create Order and Items: one flush, one commit ----
+        new_order = models.Order(
+            order_date=order_date,
+            order_amount=round(total_amount, 2),
+            shipping_date=shipping_date,
+            order_status=schemas.OrderStatus.pending,
+            coupon_id=order_data.coupon_id,
+            discount_amount=round(coupon_discount_amount, 2),
+            final_amount=round(final_amount, 2),
+            user_id=current_user.id,
+            order_items=order_items,
         )
-        db.add(order_item)
-
-    db.commit()
-    return db.query(models.Order)\
-             .options(selectinload(models.Order.order_items))\
-             .filter(models.Order.id == new_order.id).first()
-
-#Get all Orders with Items
-@router.get("/", response_model=List[schemas.OrderResponse])
-def get_all_orders(db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    if current_user.role == "admin":
-        return db.query(models.Order).options(selectinload(models.Order.order_items)).all()
-    else:
-        return db.query(models.Order).filter(models.Order.user_id == current_user.id).options(selectinload(models.Order.order_items)).all()
+        db.add(new_order)
+        db.flush()
+        # Built before commit, which would expire everything just loaded
+        response = schemas.OrderResponse.model_validate(new_order, from_attributes=True)
+        db.commit()
+    except Exception:
+        # Never leave reservations pending in a session that failed
+        db.rollback()
+        raise
+    return response
+
+#Get all Orders with Items, a page at a time
+@router.get("/", response_model=Union[schemas.OrderPage, List[schemas.OrderResponse]])
+def get_all_orders(
+    response: Response,
+    filters: OrderFilters = Depends(),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(ORDER_PAGE_SIZE, ge=1, le=MAX_ORDER_PAGE_SIZE),
+    legacy: bool = Query(False, description="Return a bare list; the next cursor is sent in the X-Next-Cursor header"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    # Customers only ever see their own orders
+    if current_user.role != "admin":
+        filters.user_id = current_user.id
+    orders, next_cursor = paginate_orders(db, filters.conditions(), cursor, limit)
+    if legacy:
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return orders
+    items = [schemas.OrderResponse.model_validate(order, from_attributes=True) for order in orders]
+    return schemas.OrderPage(items=items, next_cursor=next_cursor)
     
 # Get single Order by ID with Items
 @router.get("/{order_id}", response_model=schemas.OrderResponse)
@@ -124,18 +152,20 @@ def get_order(order_id: int, db: Session = Depends(get_db),current_user:models.U
 # Cancel Order 
 @router.put("/cancel/{order_id}")
 def cancel_order(order_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    order = db.query(models.Order).filter(models.Order.id == order_id).first()
+    # Locked: concurrent cancels queue here and only the first returns the stock
+    order = db.query(models.Order).filter(models.Order.id == order_id).with_for_update().first()
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
       # Authorization check
     if not current_user.role=="admin" and order.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="You are not allowed to cancel this order")
-    
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
 
     if order.order_status == "cancelled":
+        db.rollback()
         raise HTTPException(status_code=400, detail="Order already cancelled")
 
     order.order_status = "cancelled"
+    restock_order(db, order)
     db.commit()
 
 
@@ -1,24 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Form, UploadFile, File, Query, Path
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Form, UploadFile, File, Query, Path, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.orm import Session, selectinload
 from typing_extensions import Annotated
 from sqlalchemy import func, cast, Float
-from app.models import User, Product, ProductImage, Category,ProductVariant,VariantAttribute,CategoryVariantAttribute,Review
-from app.schemas import  ProductCreate,ProductResponse, ProductVariantResponse, ProductVariantCreate
+from sqlalchemy.exc import OperationalError
+from app.models import User, Product, ProductImage, Category,ProductVariant,VariantAttribute,CategoryVariantAttribute,Review, ImportJob, OrderItem
+from app.schemas import  ProductCreate,ProductResponse, ProductVariantResponse, ProductVariantCreate, ProductPage, ProductCardResponse, ProductView, ProductFilterPage, ImportJobResponse, ProductVariantUpdate
 from app.database import get_db
 from app.auth import get_current_user
+from app.catalog import (
+    catalog_query, serialize_product, listing_query, serialize_listing, paginate_products, page_response,
+    invalidate_catalog, product_etag, listing_etag, not_modified, not_modified_response, bump_versions,
+    refresh_price_bounds,
+    search_page, load_listing, facet_names, attribute_filter, facet_counts, CACHE_CONTROL, PAGE_SIZE, MAX_PAGE_SIZE,
+)
+from app.cache import catalog_cache
+from app.export import iter_ndjson, iter_csv
+from app.import_jobs import create_job, rows_per_second
+from app.storage import save_uploads, release_files
+from app.bulk_delete import delete_chunk, DELETE_RETRY_AFTER
+from app.stock import reset_shards
+from app.images import build_derivatives, srcsets
 from app.routers.admin import admin_required
-from typing import Optional, List
-from uuid import uuid4
-import os, uuid, json, csv
+from typing import Optional, List, Union
+import uuid, json
 
 
 
 router=APIRouter(prefix="/products", tags=["Product panel"])
 
-UPLOAD_DIR = "media/uploads"
-ERROR_DIR = "media/errors"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-os.makedirs(ERROR_DIR, exist_ok=True)
 
 # Add Products
 
@@ -48,40 +58,25 @@ async def add_product(
     brand = clean(brand)
     description = clean(description)
 
-    try:
-        new_product = Product(
-            sku=str(uuid.uuid4()),
-            product_name=product_name,
-            brand=brand,
-            is_feature=is_feature,
-            category_id=category_id,
-            description=description,
-            admin_id=admin.id
-        )
-        db.add(new_product)
-        db.flush()
-        db.refresh(new_product)
-
-        image_index = 0
-        created_variants = []
-
-        for idx, variant_str in enumerate(variants):
-            try:
-                variant_data = json.loads(variant_str)
-            except json.JSONDecodeError:
-                raise HTTPException(status_code=400, detail=f"Variant at index {idx} has invalid JSON format.")
-
-            required_fields = ["price", "stock"]
-            for field in required_fields:
-                if field not in variant_data:
-                    raise HTTPException(status_code=400, detail=f"'{field}' is required in variant at index {idx}")
-
-            attributes = variant_data.get("attributes", {})
-            price = variant_data["price"]
-            stock = variant_data["stock"]
-            discount = variant_data.get("discount", 0)
-            shipping_time = variant_data.get("shipping_time")
-            image_count = variant_data.get("image_count", 1)
+    # ----- Validate variants -----
+    parsed_variants = []
+    for idx, variant_str in enumerate(variants):
+        try:
+            variant_data = json.loads(variant_str)
+        except json.JSONDecodeError:
+            raise HTTPException(status_code=400, detail=f"Variant at index {idx} has invalid JSON format.")
+
+        required_fields = ["price", "stock"]
+        for field in required_fields:
+            if field not in variant_data:
+                raise HTTPException(status_code=400, detail=f"'{field}' is required in variant at index {idx}")
+
+        attributes = variant_data.get("attributes", {})
+        price = variant_data["price"]
+        stock = variant_data["stock"]
+        discount = variant_data.get("discount", 0)
+        shipping_time = variant_data.get("shipping_time")
+        image_count = variant_data.get("image_count", 1)
 
         # ----- Field validations -----
         if not isinstance(price, (int, float)) or price < 0:
@@ -98,7 +93,7 @@ async def add_product(
 
         if not isinstance(attributes, dict):
             raise HTTPException(status_code=400, detail=f"'attributes' must be a dictionary in variant at index {idx}")
-        
+
         if "color" not in attributes:
             raise HTTPException(status_code=400, detail=f"Missing 'color' attribute in variant at index {idx}")
 
@@ -109,68 +104,86 @@ async def add_product(
         if not isinstance(image_count, int) or image_count < 1:
             raise HTTPException(status_code=400, detail=f"Invalid 'image_count' in variant at index {idx}")
 
-            # Extract dynamic attributes
-        direct_fields = {"price", "stock", "discount", "shipping_time", "image_count"}
-        attributes = {k: v for k, v in variant_data.items() if k not in direct_fields}
-
-        new_variant = ProductVariant(
-                product_id=new_product.id,
-                price=price,
-                stock=stock,
-                discount=discount,
-                shipping_time=shipping_time,
-                attributes=attributes
-            )
-        db.add(new_variant)
-        db.flush()
-        db.refresh(new_variant)    
-
-        variant_image_urls = []
-        if len(variant_images) < image_count:
-            raise HTTPException(status_code=400, detail=f"Not enough images provided for variant at index {idx}. Expected {image_count} images, but received {len(variant_images)}.")
+        # Extract dynamic attributes, flattening the nested "attributes" object
+        direct_fields = {"price", "stock", "discount", "shipping_time", "image_count", "attributes"}
+        attributes = {**attributes, **{k: v for k, v in variant_data.items() if k not in direct_fields}}
 
-        if len(variant_images) > image_count:
-            raise HTTPException(status_code=400, detail=f"Too many images provided for variant at index {idx}. Expected {image_count} images, but received {len(variant_images)}.")
-
-        for _ in range(image_count):
-            if image_index >= len(variant_images):
-                raise HTTPException(status_code=400, detail=f"Not enough images provided for variant at index {idx}")
-
-        for _ in range(image_count):
-            if image_index >= len(variant_images):
-                raise HTTPException(status_code=400, detail=f"Not enough images provided for variant at index {idx}")
-
-            image = variant_images[image_index]
-            short_id = uuid.uuid4().hex[:8]  
-            clean_filename = image.filename.replace(" ", "_").lower()
-            filename = f"{short_id}_{clean_filename}"
-            file_path = os.path.join(UPLOAD_DIR, filename)
-
-            with open(file_path, "wb") as buffer:
-                buffer.write(await image.read())
-
-                image_url = f"/media/uploads/{filename}"
-                db.add(ProductImage(variant_id=new_variant.id, image_url=image_url))
-                variant_image_urls.append(image_url)
-                image_index += 1
-
-        # ----- Build variant response -----
-        created_variants.append({
-            "id": new_variant.id,
+        parsed_variants.append({
             "price": price,
             "stock": stock,
             "discount": discount,
             "shipping_time": shipping_time,
             "attributes": attributes,
-            "images": variant_image_urls
+            "image_count": image_count,
         })
 
+    expected_images = sum(variant["image_count"] for variant in parsed_variants)
+    if len(variant_images) < expected_images:
+        raise HTTPException(status_code=400, detail=f"Not enough images provided. Expected {expected_images} images, but received {len(variant_images)}.")
+
+    if len(variant_images) > expected_images:
+        raise HTTPException(status_code=400, detail=f"Too many images provided. Expected {expected_images} images, but received {len(variant_images)}.")
+
+    # ----- Save images concurrently, off the event loop -----
+    image_urls = await save_uploads(variant_images)
+    image_derivatives = await build_derivatives(image_urls)
+
+    try:
+        new_product = Product(
+            sku=str(uuid.uuid4()),
+            product_name=product_name,
+            brand=brand,
+            is_feature=is_feature,
+            category_id=category_id,
+            description=description,
+            admin_id=admin.id
+        )
+        image_index = 0
+        for variant in parsed_variants:
+            new_variant = ProductVariant(
+                price=variant["price"],
+                stock=variant["stock"],
+                discount=variant["discount"],
+                shipping_time=variant["shipping_time"],
+                attributes=variant["attributes"]
+            )
+            new_variant.images = [
+                ProductImage(image_url=image_url, derivatives=derivatives)
+                for image_url, derivatives in zip(
+                    image_urls[image_index:image_index + variant["image_count"]],
+                    image_derivatives[image_index:image_index + variant["image_count"]],
+                )
+            ]
+            image_index += variant["image_count"]
+            new_product.variants.append(new_variant)
+        db.add(new_product)
+        db.flush()
+
+        # ----- Build variant response -----
+        created_variants = [
+            {
+                "id": new_variant.id,
+                "price": new_variant.price,
+                "stock": new_variant.stock,
+                "discount": new_variant.discount,
+                "shipping_time": new_variant.shipping_time,
+                "attributes": new_variant.attributes,
+                "images": [image.image_url for image in new_variant.images],
+                "image_srcsets": [srcsets(image.derivatives) for image in new_variant.images]
+            }
+            for new_variant in new_product.variants
+        ]
+
+        refresh_price_bounds(db, [new_product.id])
         db.commit()
 
     except Exception as e:
         db.rollback()
+        release_files(db, image_urls)
         raise e
 
+    invalidate_catalog([new_product.id], [category_id], featured=is_feature)
+
     return ProductResponse(
         id=new_product.id,
         sku=new_product.sku,
@@ -186,19 +199,9 @@ async def add_product(
     )
 
 # Create Products in Bulk Through CSV File
-
-def save_image(file: UploadFile, product_name: str, attributes: dict) -> str:
-    ext = os.path.splitext(file.filename)[1]
-    product_slug = product_name.lower().replace(" ", "_")
-    filename = f"{product_slug}_{uuid4().hex[:6]}{ext}"
-    path = os.path.join(UPLOAD_DIR, filename)
-    with open(path, "wb") as f:
-        f.write(file.file.read())
-    return f"/media/uploads/{filename}"
-
-
-@router.post("/bulk-upload", status_code=status.HTTP_201_CREATED)
-async def upload_products_csv(
+# The upload is stored and queued; app/import_jobs.py runs the import
+@router.post("/bulk-upload", status_code=status.HTTP_202_ACCEPTED)
+def upload_products_csv(
     file: UploadFile = File(...),
     images: List[UploadFile] = File(...),
     admin=Depends(admin_required),
@@ -207,271 +210,209 @@ async def upload_products_csv(
     if admin.role != "admin":
         raise HTTPException(status_code=403, detail="Only admins can add products")
 
-    content = await file.read()
-    decoded = content.decode('utf-8').splitlines()
-    reader = csv.DictReader(decoded)
-
-    error_rows = []
-    success_count = 0
-    image_map = {img.filename: img for img in images}
-
-    product_cache = {}
-
-    for idx, row in enumerate(reader):
-        try:
-            # ----- Validate required fields -----
-            required_fields = ["product_name", "brand", "is_feature", "category_id", "description",
-                               "price", "stock", "attributes", "image_filenames"]
-            for field in required_fields:
-                if not row.get(field):
-                    raise ValueError(f"Missing required field '{field}'")
-
-            product_name = row["product_name"].strip()
-            brand = row["brand"].strip()
-            is_feature = row["is_feature"].lower() == "true"
-            category_id = int(row["category_id"])
-            description = row["description"].strip()
-            price = float(row["price"])
-            stock = int(row["stock"])
-            discount = int(row.get("discount", 0))
-            shipping_time = int(row.get("shipping_time", 0))
-            attributes = json.loads(row["attributes"])
-            image_filenames = [img.strip() for img in row["image_filenames"].split(",")]
-
-            category = db.query(Category).filter(Category.id == category_id).first()
-            if not category:
-                raise ValueError(f"Category ID {category_id} does not exist")
-
-            # ----- Check if product already created -----
-            product_key = f"{product_name}_{category_id}"
-            if product_key in product_cache:
-                new_product = product_cache[product_key]
-            else:
-                new_product = Product(
-                    sku=str(uuid4()),
-                    product_name=product_name,
-                    brand=brand,
-                    is_feature=is_feature,
-                    category_id=category_id,
-                    description=description,
-                    admin_id=admin.id
-                )
-                db.add(new_product)
-                db.flush()
-                db.refresh(new_product)
-                product_cache[product_key] = new_product
-
-            # ----- Create Variant -----
-            new_variant = ProductVariant(
-                product_id=new_product.id,
-                price=price,
-                stock=stock,
-                discount=discount,
-                shipping_time=shipping_time,
-                attributes=attributes
-            )
-            db.add(new_variant)
-            db.flush()
-            db.refresh(new_variant)
-
-            # ----- Save Images -----
-            for img_name in image_filenames:
-                if img_name not in image_map:
-                    raise ValueError(f"Image file '{img_name}' not found in upload")
-                img_url = save_image(image_map[img_name], product_name, attributes)
-                db.add(ProductImage(variant_id=new_variant.id, image_url=img_url))
-
-            db.commit()
-            success_count += 1
-
-        except Exception as e:
-            db.rollback()
-            row["error"] = str(e)
-            error_rows.append(row)
-
-    # ----- Save errors to CSV -----
-    error_file_path = None
-    if error_rows:
-        error_file_path = os.path.join(ERROR_DIR, f"errors_{uuid4().hex[:6]}.csv")
-        with open(error_file_path, "w", newline="", encoding="utf-8") as err_file:
-            writer = csv.DictWriter(err_file, fieldnames=reader.fieldnames + ["error"])
-            writer.writeheader()
-            writer.writerows(error_rows)
-
+    job = create_job(db, admin.id, file, images)
     return {
-        "message": f"{success_count} variants uploaded successfully",
-        "errors": len(error_rows),
-        "error_file": error_file_path,
-        "error_details": error_rows[:5]
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/products/bulk-upload/{job.id}",
     }
 
 
+@router.get("/bulk-upload/{job_id}", response_model=ImportJobResponse)
+def get_upload_job(job_id: int, admin=Depends(admin_required), db: Session = Depends(get_db)):
+    job = db.query(ImportJob).filter(ImportJob.id == job_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    response = ImportJobResponse.model_validate(job)
+    response.rows_per_second = rows_per_second(job)
+    return response
+
+
 # Get only featured products
-@router.get("/featuredproducts", response_model=List[ProductResponse])
-def get_featured_products(db: Session = Depends(get_db)):
-    featured_products = db.query(Product).filter(Product.is_feature == True).all()
-
-    product_responses = []
-    for product in featured_products:
-        variants = []
-        for variant in product.variants:
-            variant_dict = {
-                "id": variant.id,
-                "price": variant.price,
-                "stock": variant.stock,
-                "discount": variant.discount,
-                "shipping_time": variant.shipping_time,
-                "attributes": variant.attributes or {},
-                "images": [img.image_url for img in variant.images],
-            }
-            variants.append(ProductVariantResponse(**variant_dict))
-
-        product_dict = {
-            "id": product.id,
-            "sku": product.sku,
-            "admin_id": product.admin_id,
-            "product_name": product.product_name,
-            "brand": product.brand,
-            "category_id": product.category_id,
-            "description": product.description,
-            "created_at": product.created_at,
-            "updated_at": product.updated_at,
-            "variants": variants,
-        }
-        product_responses.append(ProductResponse(**product_dict))
+@router.get("/featuredproducts", response_model=List[Union[ProductResponse, ProductCardResponse]])
+def get_featured_products(
+    request: Request,
+    view: ProductView = Query(ProductView.full),
+    db: Session = Depends(get_db)
+):
+    cache_control = CACHE_CONTROL["featured"]
+    etag = listing_etag(db, [Product.is_feature == True], "featured", view)
+    if not_modified(request, etag):
+        return not_modified_response(etag, cache_control)
 
-    return product_responses
+    key = ("featured", view, etag)
+    payload = catalog_cache.get(key)
+    if payload is None:
+        generation = catalog_cache.generation
+        featured_products = listing_query(db, view).filter(Product.is_feature == True).all()
+        payload = [item.model_dump(mode="json") for item in serialize_listing(featured_products, view)]
+        catalog_cache.set(key, payload, tags=("featured",), generation=generation)
+    return JSONResponse(payload, headers={"ETag": etag, "Cache-Control": cache_control})
 
 
 #get all products
-@router.get("/allproducts", response_model=List[ProductResponse])
-def get_products(db: Session = Depends(get_db)):
-    products = db.query(Product).all()
-    product_responses = []
-    for product in products:
-        variants = []
-        for variant in product.variants:
-            variant_dict = {
-                "id": variant.id,
-                "price": variant.price,
-                "stock": variant.stock,
-                "discount": variant.discount,
-                "shipping_time": variant.shipping_time,
-                "attributes": variant.attributes or {}, 
-                "images": [img.image_url for img in variant.images],
-            }
-            variants.append(ProductVariantResponse(**variant_dict))
-
-        product_dict = {
-            "id": product.id,
-            "sku": product.sku,
-            "admin_id": product.admin_id,
-            "product_name": product.product_name,
-            "brand": product.brand,
-            "category_id": product.category_id,
-            "description": product.description,
-            "created_at": product.created_at,
-            "updated_at": product.updated_at,
-            "variants": variants,
-        }
-        product_responses.append(ProductResponse(**product_dict))
+@router.get("/allproducts", response_model=Union[ProductPage, List[Union[ProductResponse, ProductCardResponse]]])
+def get_products(
+    request: Request,
+    view: ProductView = Query(ProductView.full),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    legacy: bool = Query(False, description="Return a bare list; the next cursor is sent in the X-Next-Cursor header"),
+    db: Session = Depends(get_db)
+):
+    cache_control = CACHE_CONTROL["listing"]
+    etag = listing_etag(db, [], "all", view, legacy, cursor=cursor, limit=limit)
+    if not_modified(request, etag):
+        return not_modified_response(etag, cache_control)
+
+    key = ("all", view, cursor, limit, etag)
+    page = catalog_cache.get(key)
+    if page is None:
+        generation = catalog_cache.generation
+        products, next_cursor = paginate_products(listing_query(db, view), cursor, limit)
+        page = ProductPage(items=serialize_listing(products, view), next_cursor=next_cursor).model_dump(mode="json")
+        catalog_cache.set(key, page, tags=("all",), generation=generation)
+    return page_response(page, legacy, headers={"ETag": etag, "Cache-Control": cache_control})
+
+# Stream the whole catalog for feeds and partner integrations
+@router.get("/export.ndjson")
+def export_products_ndjson():
+    return StreamingResponse(iter_ndjson(), media_type="application/x-ndjson")
+
+@router.get("/export.csv")
+def export_products_csv():
+    return StreamingResponse(
+        iter_csv(), media_type="text/csv",
+        headers={"Content-Disposition": 'attachment; filename="products.csv"'}
+    )
 
-    return product_responses
+# Full-text product search
+@router.get("/search", response_model=ProductPage)
+def search_products(
+    q: str = Query(..., min_length=1, max_length=200),
+    view: ProductView = Query(ProductView.full),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db)
+):
+    product_ids, next_cursor = search_page(db, q, cursor, limit)
+    items = serialize_listing(load_listing(db, view, product_ids), view)
+    return ProductPage(items=items, next_cursor=next_cursor)
+
+# Filter by category, brand and variant attributes (?color=red&size=M), with facet counts
+FILTER_PARAMS = {"category_id", "brand", "view", "cursor", "limit"}
+
+@router.get("/filter", response_model=ProductFilterPage)
+def filter_products(
+    request: Request,
+    category_id: Optional[int] = Query(None, ge=1),
+    brand: Optional[str] = Query(None),
+    view: ProductView = Query(ProductView.full),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db)
+):
+    names = facet_names(db, category_id)
+    selected = {}
+    for key, value in request.query_params.multi_items():
+        if key in FILTER_PARAMS:
+            continue
+        if key not in names:
+            raise HTTPException(status_code=400, detail=f"Unknown filter attribute '{key}'")
+        selected.setdefault(key, []).append(value)
+
+    filters = []
+    if category_id is not None:
+        filters.append(Product.category_id == category_id)
+    if brand:
+        filters.append(Product.brand == brand)
+
+    products, next_cursor = paginate_products(
+        listing_query(db, view).filter(*filters, attribute_filter(selected)), cursor, limit
+    )
+    return ProductFilterPage(
+        items=serialize_listing(products, view),
+        next_cursor=next_cursor,
+        facets=facet_counts(db, filters, selected, names),
+    )
 
 # GET product by ID
 
 @router.get("/{product_id}", response_model=ProductResponse)
-def get_product(product_id: Annotated[int, Path(ge=1)], db: Session = Depends(get_db)):
-    product = db.query(Product).filter(Product.id == product_id).first()
-    if not product:
+def get_product(product_id: Annotated[int, Path(ge=1)], request: Request, db: Session = Depends(get_db)):
+    etag = product_etag(db, product_id)
+    if etag is None:
         raise HTTPException(status_code=404, detail="Product not found")
-
-
-    variants = db.query(ProductVariant).filter_by(product_id=product.id).all()
-    variant_list = []
-    for variant in variants:
-        images = db.query(ProductImage).filter_by(variant_id=variant.id).all()
-        image_urls = [img.image_url for img in images]
-        variant_list.append({
-            "id": variant.id,
-            "price": variant.price,
-            "stock": variant.stock,
-            "discount": variant.discount,
-            "shipping_time": variant.shipping_time,
-            "attributes": variant.attributes,
-            "images": image_urls
-        })
-
-    return ProductResponse(
-        id=product.id,
-        sku=product.sku,
-        product_name=product.product_name,
-        brand=product.brand,
-        category_id=product.category_id,
-        description=product.description,
-        admin_id=product.admin_id,
-        created_at=product.created_at,
-        updated_at=product.updated_at,
-        variants=variant_list,
-        images=[]
-    )
+    cache_control = CACHE_CONTROL["product"]
+    if not_modified(request, etag):
+        return not_modified_response(etag, cache_control)
+
+    key = ("product", product_id, etag)
+    payload = catalog_cache.get(key)
+    if payload is None:
+        generation = catalog_cache.generation
+        product = catalog_query(db).filter(Product.id == product_id).first()
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        payload = serialize_product(product).model_dump(mode="json")
+        catalog_cache.set(key, payload, tags=(f"product:{product_id}",), generation=generation)
+    return JSONResponse(payload, headers={"ETag": etag, "Cache-Control": cache_control})
 
 #get product by category
-@router.get("/category/{category_id}", response_model=List[ProductResponse])
-def get_products_by_category(category_id: Annotated[int, Path(ge=1)], db: Session = Depends(get_db)):
+@router.get("/category/{category_id}", response_model=Union[ProductPage, List[Union[ProductResponse, ProductCardResponse]]])
+def get_products_by_category(
+    category_id: Annotated[int, Path(ge=1)],
+    request: Request,
+    view: ProductView = Query(ProductView.full),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    legacy: bool = Query(False, description="Return a bare list; the next cursor is sent in the X-Next-Cursor header"),
+    db: Session = Depends(get_db)
+):
     category = db.query(Category).filter(Category.id == category_id).first()
     if not category:
         raise HTTPException(
             status_code=404,
             detail=f"Category with ID {category_id} does not exist."
         )
-    products = db.query(Product).filter(Product.category_id == category_id).all()
-    response = []
-    for product in products:
-        variants = db.query(ProductVariant).filter_by(product_id=product.id).all()
-        variant_list = []
-        for variant in variants:
-            images = db.query(ProductImage).filter_by(variant_id=variant.id).all()
-            image_urls = [img.image_url for img in images]
-            variant_list.append({
-                "id": variant.id,
-                "price": variant.price,
-                "stock": variant.stock,
-                "discount": variant.discount,
-                "shipping_time": variant.shipping_time,
-                "attributes": variant.attributes,
-                "images": image_urls
-            })
-
-        response.append(ProductResponse(
-            id=product.id,
-            sku=product.sku,
-            product_name=product.product_name,
-            brand=product.brand,
-            category_id=product.category_id,
-            description=product.description,
-            admin_id=product.admin_id,
-            created_at=product.created_at,
-            updated_at=product.updated_at,
-            variants=variant_list,
-            images=[]
-        ))
-
-    return response
+    cache_control = CACHE_CONTROL["listing"]
+    etag = listing_etag(
+        db, [Product.category_id == category_id], "category", category_id, view, legacy, cursor=cursor, limit=limit
+    )
+    if not_modified(request, etag):
+        return not_modified_response(etag, cache_control)
+
+    key = ("category", category_id, view, cursor, limit, etag)
+    page = catalog_cache.get(key)
+    if page is None:
+        generation = catalog_cache.generation
+        products, next_cursor = paginate_products(
+            listing_query(db, view).filter(Product.category_id == category_id), cursor, limit
+        )
+        page = ProductPage(items=serialize_listing(products, view), next_cursor=next_cursor).model_dump(mode="json")
+        catalog_cache.set(key, page, tags=(f"category:{category_id}",), generation=generation)
+    return page_response(page, legacy, headers={"ETag": etag, "Cache-Control": cache_control})
 
 
 @router.delete("/products/{product_id}")
 def delete_product(product_id: int, db: Session = Depends(get_db), admin: dict = Depends(admin_required)):
-    product = db.query(Product).filter(Product.id == product_id).first()
-    if not product:
+    if not db.query(Product.id).filter(Product.id == product_id).first():
         raise HTTPException(status_code=404, detail="Product not found")
-    # Step 1: Delete related reviews
-    db.query(Review).filter_by(product_id=product_id).delete(synchronize_session=False)
-    db.query(ProductImage).filter(ProductImage.variant_id.in_(
-        db.query(ProductVariant.id).filter_by(product_id=product_id))).delete(synchronize_session=False)
-    db.query(ProductVariant).filter_by(product_id=product_id).delete()
-    db.delete(product)
+    try:
+        result = delete_chunk(db, [product_id])
+    except OperationalError:
+        # lock_timeout: something else holds the product's variants or images
+        result = {"busy": [product_id]}
+    if result["busy"]:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Product is being modified, try again",
+                            headers={"Retry-After": str(DELETE_RETRY_AFTER)})
+    if result["has_orders"]:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Product has orders and cannot be deleted")
     db.commit()
+    release_files(db, result["image_urls"])
+    invalidate_catalog([product_id], result["category_ids"], featured=result["featured"])
     return {"detail": "Product deleted successfully"}
 
 
@@ -483,8 +424,9 @@ async def update_product(
     brand: Optional[str] = Form(None),
     category_id: Optional[int] = Form(None),
     description: Optional[str] = Form(None),
-    variants: Optional[List[str]] = Form(None),
-    variant_images: Optional[List[UploadFile]] = File(None),
+    # Not Optional[List[...]]: FastAPI 0.110 reads that as a single form value
+    variants: List[str] = Form(None),
+    variant_images: List[UploadFile] = File(None),
     admin: dict = Depends(admin_required),
     db: Session = Depends(get_db)
 ):
@@ -492,6 +434,7 @@ async def update_product(
     product = db.query(Product).filter(Product.id == product_id).first()
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
+    old_category_id = product.category_id
 
     # Update basic product fields if provided
     if product_name:
@@ -515,203 +458,129 @@ async def update_product(
             raise HTTPException(status_code=400, detail="Category not found")
         product.category_id = category_id
 
-    db.commit()
-    db.refresh(product)
+    # Variants are diffed by id: listed ones are updated in place, ones
+    # without an id are added, stored ones not listed are removed.
+    payloads = []
+    for idx, variant_str in enumerate(variants or []):
+        try:
+            variant_data = json.loads(variant_str)
+        except json.JSONDecodeError:
+            raise HTTPException(status_code=400, detail=f"Variant at index {idx} has invalid JSON format.")
+        if not isinstance(variant_data, dict):
+            raise HTTPException(status_code=400, detail=f"Variant at index {idx} must be a JSON object.")
 
-    created_variants = []
-    image_index = 0
+        attributes = variant_data.get("attributes") or {}
+        if not isinstance(attributes, dict):
+            raise HTTPException(status_code=400, detail=f"'attributes' must be a dictionary in variant at index {idx}")
 
-    if variants:
-        # Remove old variants and images
-        db.query(ProductImage).filter(ProductImage.variant_id.in_(
-            db.query(ProductVariant.id).filter_by(product_id=product_id)
-        )).delete(synchronize_session=False)
-
-        db.query(ProductVariant).filter_by(product_id=product_id).delete()
-
-        for idx, variant_str in enumerate(variants):
-            try:
-                variant_data = json.loads(variant_str)
-            except json.JSONDecodeError:
-                raise HTTPException(status_code=400, detail=f"Variant at index {idx} has invalid JSON format.")
-
-            # Validate variant data using ProductVariantCreate model
-            try:
-                variant = ProductVariantCreate(**variant_data)
-            except ValueError as e:
-                raise HTTPException(status_code=400, detail=f"Invalid data for variant at index {idx}: {e}")
-
-            attributes = {k: v for k, v in variant_data.items() if k not in {"price", "stock", "discount", "shipping_time", "image_count"}}
-            new_variant = ProductVariant(
-                product_id=product.id,
-                price=variant.price,
-                stock=variant.stock,
-                discount=variant.discount,
-                shipping_time=variant.shipping_time,
-                attributes=attributes
-            )
-            db.add(new_variant)
-            db.commit()
-            db.refresh(new_variant)
-
-            image_count = variant.image_count
-            image_urls = []
-            for _ in range(image_count):
-                if variant_images and image_index < len(variant_images):
-                    image = variant_images[image_index]
-                    filename = f"{uuid.uuid4()}_{image.filename}"
-                    file_path = os.path.join(UPLOAD_DIR, filename)
-                    with open(file_path, "wb") as buffer:
-                        buffer.write(await image.read())
-                    image_url = f"/static/uploads/{filename}"
-                    db.add(ProductImage(variant_id=new_variant.id, image_url=image_url))
-                    image_urls.append(image_url)
-                    image_index += 1
-
-            created_variants.append({
-                "id": new_variant.id,
-                "price": new_variant.price,
-                "stock": new_variant.stock,
-                "discount": new_variant.discount,
-                "shipping_time": new_variant.shipping_time,
-                "attributes": new_variant.attributes,
-                "images": image_urls
-            })
+        direct_fields = {"id", "price", "stock", "discount", "shipping_time", "image_count", "images", "attributes"}
+        fields = {k: v for k, v in variant_data.items() if k in direct_fields}
+        fields["attributes"] = {
+            **attributes,
+            **{k: v for k, v in variant_data.items() if k not in direct_fields},
+        }
+        try:
+            payloads.append(ProductVariantUpdate(**fields))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid data for variant at index {idx}: {e}")
 
-    return ProductResponse(
-        id=product.id,
-        sku=product.sku,
-        product_name=product.product_name,
-        brand=product.brand,
-        category_id=product.category_id,
-        description=product.description,
-        admin_id=product.admin_id,
-        created_at=product.created_at,
-        updated_at=product.updated_at,
-        variants= variants,
-        images=[]
-    )
+    stored = {}
+    removed_ids = set()
+    if variants:
+        stored = {
+            variant.id: variant for variant in
+            db.query(ProductVariant).options(selectinload(ProductVariant.images)).filter_by(product_id=product_id)
+        }
+        listed_ids = [payload.id for payload in payloads if payload.id is not None]
+        if len(listed_ids) != len(set(listed_ids)):
+            raise HTTPException(status_code=400, detail="Each variant id may only be listed once")
+        unknown_ids = set(listed_ids) - set(stored)
+        if unknown_ids:
+            raise HTTPException(status_code=400, detail=f"Variants {sorted(unknown_ids)} do not belong to this product")
+        for payload in payloads:
+            if payload.id is not None and payload.images is not None:
+                current = {image.image_url for image in stored[payload.id].images}
+                if not set(payload.images) <= current:
+                    raise HTTPException(status_code=400, detail=f"Variant {payload.id} has no images {sorted(set(payload.images) - current)}")
+
+        removed_ids = set(stored) - set(listed_ids)
+        ordered_ids = {variant_id for (variant_id,) in db.query(OrderItem.variant_id).filter(OrderItem.variant_id.in_(removed_ids))}
+        if ordered_ids:
+            raise HTTPException(status_code=409, detail=f"Variants {sorted(ordered_ids)} have orders and cannot be removed; set their stock to 0 instead")
+
+    expected_images = sum(payload.image_count for payload in payloads)
+    if len(variant_images or []) != expected_images:
+        raise HTTPException(status_code=400, detail=f"Expected {expected_images} images, but received {len(variant_images or [])}.")
+
+    # ----- Save new images concurrently, off the event loop -----
+    image_urls = await save_uploads(variant_images or [])
+    new_images = iter(zip(image_urls, await build_derivatives(image_urls)))
+
+    replaced_image_urls = []
+    restocked_ids = []
+    try:
+        for payload in payloads:
+            variant = stored.get(payload.id)
+            if variant is None:
+                variant = ProductVariant(product_id=product.id)
+                db.add(variant)
+            changes = {
+                "price": float(payload.price),
+                "stock": payload.stock,
+                "discount": payload.discount,
+                "shipping_time": payload.shipping_time,
+                "attributes": payload.attributes,
+            }
+            if variant.stock_sharded:
+                # The stock shown was pool plus buckets: a new value replaces
+                # both, the one shown leaves them as they are
+                if variant.available_stock == payload.stock:
+                    del changes["stock"]
+                else:
+                    restocked_ids.append(variant.id)
+            for column, value in changes.items():
+                if getattr(variant, column) != value:
+                    setattr(variant, column, value)
+
+            if payload.images is not None:
+                for image in list(variant.images):
+                    if image.image_url not in payload.images:
+                        replaced_image_urls.append(image.image_url)
+                        variant.images.remove(image)
+            for _ in range(payload.image_count):
+                image_url, derivatives = next(new_images)
+                variant.images.append(ProductImage(image_url=image_url, derivatives=derivatives))
+
+        for variant_id in removed_ids:
+            replaced_image_urls += [image.image_url for image in stored[variant_id].images]
+            db.delete(stored[variant_id])
+
+        reset_shards(db, restocked_ids)
+        if variants:
+            refresh_price_bounds(db, [product.id])
+        bump_versions(db, [product.id])
+        db.commit()
+    except Exception:
+        db.rollback()
+        release_files(db, image_urls)
+        raise
 
-#get product by category
-@router.get("/category/{category_id}", response_model=List[ProductResponse])
-def get_products_by_category(category_id: Annotated[int, Path(ge=1)], db: Session = Depends(get_db)):
-    category = db.query(Category).filter(Category.id == category_id).first()
-    if not category:
-        raise HTTPException(
-            status_code=404,
-            detail=f"Category with ID {category_id} does not exist."
-        )
-    products = db.query(Product).filter(Product.category_id == category_id).all()
-    response = []
-    for product in products:
-        variants = db.query(ProductVariant).filter_by(product_id=product.id).all()
-        variant_list = []
-        for variant in variants:
-            images = db.query(ProductImage).filter_by(variant_id=variant.id).all()
-            image_urls = [img.image_url for img in images]
-            variant_list.append({
-                "id": variant.id,
-                "price": variant.price,
-                "stock": variant.stock,
-                "discount": variant.discount,
-                "shipping_time": variant.shipping_time,
-                "attributes": variant.attributes,
-                "images": image_urls
-            })
-
-        response.append(ProductResponse(
-            id=product.id,
-            sku=product.sku,
-            product_name=product.product_name,
-            brand=product.brand,
-            category_id=product.category_id,
-            description=product.description,
-            admin_id=product.admin_id,
-            created_at=product.created_at,
-            updated_at=product.updated_at,
-            variants=variant_list,
-            images=[]
-        ))
+    release_files(db, replaced_image_urls)
+    invalidate_catalog([product.id], {old_category_id, product.category_id}, featured=product.is_feature)
 
-    return response
+    return serialize_product(catalog_query(db).filter(Product.id == product_id).one())
 
 # Filter Products by Rating
-
-from app.models import Product, Review
-
-@router.get("/rating/by-rating", response_model=List[ProductResponse])
+@router.get("/rating/by-rating", response_model=List[Union[ProductResponse, ProductCardResponse]])
 def get_products_by_rating(
     min_rating: Optional[float] = Query(0, ge=0, le=5),
+    view: ProductView = Query(ProductView.full),
     db: Session = Depends(get_db)
 ):
-    subquery = (
-        db.query(
-            Review.product_id,
-            func.avg(Review.rating).label("avg_rating")
-        )
-        .group_by(Review.product_id)
-        .subquery()
-    )
-
     products = (
-        db.query(Product)
-        .join(subquery, Product.id == subquery.c.product_id)
-        .filter(subquery.c.avg_rating >= min_rating)
+        listing_query(db, view)
+        .filter(Product.review_count > 0, Product.avg_rating >= min_rating)
+        .order_by(Product.avg_rating.desc(), Product.id)
         .all()
     )
-
-    product_responses = []
-    for product in products:
-        variants = db.query(ProductVariant).filter_by(product_id=product.id).all()
-        variant_list = []
-
-        for variant in variants:
-            images = db.query(ProductImage).filter_by(variant_id=variant.id).all()
-            image_urls = [img.image_url for img in images]
-            variant_list.append(ProductVariantResponse(
-                id=variant.id,
-                price=variant.price,
-                stock=variant.stock,
-                discount=variant.discount,
-                shipping_time=variant.shipping_time,
-                attributes=variant.attributes,
-                images=image_urls
-            ))
-
-        product_responses.append(ProductResponse(
-            id=product.id,
-            sku=product.sku,
-            product_name=product.product_name,
-            brand=product.brand,
-            category_id=product.category_id,
-            description=product.description,
-            admin_id=product.admin_id,
-            created_at=product.created_at,
-            updated_at=product.updated_at,
-            variants=variant_list,
-            images=[]
-        ))
-
-    return product_responses
-
- 
-
-# Delete products by ID
-
-# @router.delete("/delete/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
-# def delete_product(
-#     product_id: int,
-#     admin: dict = Depends(admin_required),
-#     db: Session = Depends(get_db)
-# ):
-#     if admin.role != "admin":
-#         raise HTTPException(status_code=403, detail="Only admins can delete products")
-
-#     product = db.query(Product).filter(Product.id == product_id).first()
-#     if not product:
-#         raise HTTPException(status_code=404, detail="Product not found")
-
-#     db.delete(product)
-#     db.commit()
-
-#     return {"detail": f"Product with ID {product_id} has been deleted successfully"}
\ No newline at end of file
+    return serialize_listing(products, view)
@@ -5,6 +5,7 @@ from app import models, schemas
 from app.database import get_db
 from app.auth import get_current_user
 from app.models import User
+from app.ratings import apply_rating_change
 
 router = APIRouter(prefix="/reviews", tags=["Reviews"])
 
@@ -54,6 +55,7 @@ def create_review(
     review_email = review.email if review.email else current_user.email
 
     db.add(new_review)
+    apply_rating_change(db, review.product_id, added=review.rating)
     db.commit()
     db.refresh(new_review)
 
@@ -96,6 +98,7 @@ def delete_review(
     if not review:
         raise HTTPException(status_code=404, detail="Review not found or not yours")
 
+    apply_rating_change(db, review.product_id, removed=review.rating)
     db.delete(review)
     db.commit()
     return {"detail": "Review deleted successfully"}
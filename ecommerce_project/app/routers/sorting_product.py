@@ -1,72 +1,84 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, asc, cast, Float
 from typing import List, Optional
 from app.database import get_db
-from app.models import Product, ProductVariant, OrderItem, Review
-from app.schemas import ProductResponse
+from app.schemas import ProductResponse, ProductPage, ProductSort, ProductView
+from app.catalog import listing_query, serialize_listing, sorted_page, PAGE_SIZE, MAX_PAGE_SIZE
 from enum import Enum
-router = APIRouter(prefix="/sort")
+router = APIRouter(prefix="/sort", tags=["Sorting"])
 
 class SortOrderEnum(str, Enum):
     asc = "asc"
     desc = "desc"
 
+# One query builder for every sort: price (after discount), rating,
+# popularity (units sold) or newest, with an optional price range.
+@router.get("/products", response_model=ProductPage)
+def sort_and_filter_products(
+    sort_by: ProductSort = Query(ProductSort.newest),
+    sort_order: SortOrderEnum = Query(SortOrderEnum.desc),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    view: ProductView = Query(ProductView.full),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: Session = Depends(get_db)
+):
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise HTTPException(status_code=400, detail="min_price cannot be greater than max_price")
+    products, next_cursor = sorted_page(
+        listing_query(db, view), sort_by, sort_order == SortOrderEnum.desc, cursor, limit, min_price, max_price
+    )
+    return ProductPage(items=serialize_listing(products, view), next_cursor=next_cursor)
+
+
+def legacy_sorted_list(db: Session, response: Response, sort_by: ProductSort, descending: bool,
+                       cursor: Optional[str], limit: int):
+    products, next_cursor = sorted_page(listing_query(db, ProductView.full), sort_by, descending, cursor, limit)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return serialize_listing(products, ProductView.full)
+
+
 @router.get("/sort_by_price/", response_model=List[ProductResponse])
 def sort_products_by_price(
+    response: Response,
     sort_order: Optional[SortOrderEnum] = Query(default=None),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     db: Session = Depends(get_db)
 ):
     """
-    Endpoint to sort products by price.
-    - No sort_order => Random/mixed order.
+    Endpoint to sort products by price after discount, one entry per product.
+    - No sort_order => newest first.
     - 'asc' => Sort price low to high.
     - 'desc' => Sort price high to low.
+    The next page cursor is returned in the X-Next-Cursor header.
     """
-
-    query = db.query(Product).join(Product.variants)
-
-    if sort_order == SortOrderEnum.asc:
-        query = query.order_by(asc(ProductVariant.price))
-    elif sort_order == SortOrderEnum.desc:
-        query = query.order_by(desc(ProductVariant.price))
-    # else: leave as is for random/mixed order
-
-    products = query.all()
+    if sort_order is None:
+        products = legacy_sorted_list(db, response, ProductSort.newest, True, cursor, limit)
+    else:
+        products = legacy_sorted_list(db, response, ProductSort.price, sort_order == SortOrderEnum.desc, cursor, limit)
 
     if not products:
         raise HTTPException(status_code=404, detail="No products found.")
 
     return products
-from sqlalchemy import func, desc
-from typing import Optional
-from fastapi import Query
+
 class SortByEnum(str, Enum):
     popularity = "popularity"
     rating = "rating"
-@router.get("/popu_or_rating/")
+@router.get("/popu_or_rating/", response_model=List[ProductResponse])
 def sort_products(
+    response: Response,
     sort_by: Optional[SortByEnum] = Query(default=None),
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     db: Session = Depends(get_db)
 ):
-    query = db.query(Product)
-
-    if sort_by == SortByEnum.popularity:
-        query = (
-            query
-            .join(Product.variants)
-            .join(OrderItem, OrderItem.variant_id == ProductVariant.id)
-            .group_by(Product.id)
-            .order_by(desc(func.count(OrderItem.id)))
-        )
-
-    elif sort_by == SortByEnum.rating:
-        query = (
-            query
-            .outerjoin(Review, Review.product_id == Product.id)
-            .group_by(Product.id)
-            .order_by(desc(func.avg(Review.rating)))  # No need to cast anymore
-        )
-
-    products = query.all()
-    return products
+    sort = {
+        SortByEnum.popularity: ProductSort.popularity,
+        SortByEnum.rating: ProductSort.rating,
+        None: ProductSort.newest,
+    }[sort_by]
+    return legacy_sorted_list(db, response, sort, True, cursor, limit)
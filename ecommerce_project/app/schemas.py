@@ -1,7 +1,7 @@
 from pydantic import BaseModel, EmailStr, Field, field_validator,condecimal, conint
 from datetime import date,datetime
 from enum import Enum
-from typing import Optional, List, Any, Literal,Dict
+from typing import Optional, List, Any, Literal,Dict, Union
 from app.models import RatingEnum
 
 
@@ -103,10 +103,29 @@ class ProductVariantCreate(ProductVariantBase):
 class ProductVariantResponse(ProductVariantBase):
     id: int
     images: List[str]
+    # Per image: format -> srcset string over the resized derivatives
+    image_srcsets: List[Dict[str, str]] = []
 
     class Config:
         from_attributes = True
 
+# update_product variant payload: with an id it edits that variant, without one it adds a variant
+class ProductVariantUpdate(ProductVariantBase):
+    id: Optional[int] = None
+    image_count: Annotated[int, Field(ge=0)] = 0
+    # Existing image URLs to keep; None keeps them all
+    images: Optional[List[str]] = None
+
+# Admin bulk delete: explicit ids and/or a brand or category; all given filters must match
+class ProductBulkDelete(BaseModel):
+    product_ids: Optional[List[int]] = None
+    brand: Optional[str] = None
+    category_id: Optional[int] = None
+
+# Sharded stock for a hot variant; 0 turns it off
+class StockShardsUpdate(BaseModel):
+    shards: Annotated[int, Field(ge=0, le=64)]
+
 # Product
 
 class ProductBase(BaseModel):
@@ -134,6 +153,53 @@ class ProductResponse(ProductBase):
     class Config:
         from_attributes = True
 
+class ProductView(str, Enum):
+    card = "card"
+    full = "full"
+
+class ProductSort(str, Enum):
+    price = "price"
+    rating = "rating"
+    popularity = "popularity"
+    newest = "newest"
+
+# Lean listing shape: only what a product card renders
+class ProductCardResponse(BaseModel):
+    id: int
+    product_name: str
+    brand: str
+    thumbnail: Optional[str] = None
+    thumbnail_srcset: Dict[str, str] = {}
+    min_price: Optional[float] = None
+
+    class Config:
+        from_attributes = True
+
+class ProductPage(BaseModel):
+    items: List[Union[ProductResponse, ProductCardResponse]]
+    next_cursor: Optional[str] = None
+
+class ProductFilterPage(ProductPage):
+    # attribute name -> attribute value -> number of matching products
+    facets: Dict[str, Dict[str, int]] = {}
+
+class ImportJobResponse(BaseModel):
+    id: int
+    status: str
+    rows_processed: int
+    success_count: int
+    error_count: int
+    rows_per_second: Optional[float] = None
+    error_file: Optional[str] = None
+    error_details: Optional[List[Dict[str, Any]]] = None
+    message: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
 
 # Cart Item Schema
 
@@ -284,7 +350,7 @@ class OrderItemBase(BaseModel):
 
     product_id: int
     variant_id: int
-    quantity: int
+    quantity: Annotated[int, Field(gt=0)]
 
 
 class OrderItemCreate(OrderItemBase):
@@ -332,6 +398,10 @@ class OrderResponse(OrderBase):
     class Config:
         orm_mode = True
 
+class OrderPage(BaseModel):
+    items: List[OrderResponse]
+    next_cursor: Optional[str] = None
+
 class OrderUpdate(BaseModel):
     order_status: Optional[OrderStatus] = None
     cancel_reason: Optional[str] = None
@@ -0,0 +1,326 @@
+import argparse, logging, os, threading
+from sqlalchemy import Integer, column, delete, func, insert, select, update, values
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models import ProductVariant, VariantStockShard
+from app.catalog import record_sales
+
+logger = logging.getLogger(__name__)
+
+MAX_STOCK_SHARDS = 64
+REBALANCE_INTERVAL = int(os.getenv("STOCK_REBALANCE_INTERVAL", "5"))  # seconds
+
+
+# Stock moves for orders. Every line of an order is reserved by one
+# conditional UPDATE ... FROM (VALUES ...) that only decrements rows still
+# holding enough stock, so concurrent checkouts cannot oversell: whichever
+# commits first wins and the others see the decremented value.
+#
+# Hot variants can be sharded: their stock is spread over N
+# variant_stock_shards rows and a checkout decrements one bucket, picked at
+# random among those not locked by another checkout, so N checkouts proceed
+# in parallel. product_variants.stock then holds stock not yet handed out
+# (returns, admin edits). A line no free bucket can serve alone locks the
+# pool and every bucket and is split across them, so whatever the variant
+# shows as available can be bought. The rebalancer evens the buckets out and
+# empties the pool into them.
+#
+# Units sold are counted on the row the stock came from, variant or bucket,
+# and added to products.units_sold in the background (fold_sales,
+# rebalance), which keeps the product row out of the checkout.
+
+def _quantities(quantities: dict):
+    return values(column("variant_id", Integer), column("quantity", Integer), name="q").data(
+        list(quantities.items())
+    )
+
+
+def _take_from_shard(db: Session, variant_id: int, quantity: int) -> bool:
+    """Take the whole line from one bucket not locked by another checkout."""
+    pick = (
+        select(VariantStockShard.id)
+        .where(VariantStockShard.variant_id == variant_id, VariantStockShard.stock >= quantity)
+        .order_by(func.random())
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    taken = db.execute(
+        update(VariantStockShard)
+        .where(VariantStockShard.id == pick)
+        .values(stock=VariantStockShard.stock - quantity, sold=VariantStockShard.sold + quantity)
+        .returning(VariantStockShard.id)
+    ).first()
+    return taken is not None
+
+
+def _reserve_sharded(db: Session, variant_id: int, quantity: int) -> bool:
+    """Serve one line from a bucket, else from the pool and buckets together; False if out of stock."""
+    if _take_from_shard(db, variant_id, quantity):
+        return True
+    # Pool, then buckets in shard_no order, as the rebalancer locks them
+    pool = db.execute(
+        select(ProductVariant.stock).where(ProductVariant.id == variant_id).with_for_update(key_share=True)
+    ).scalar_one()
+    shards = db.execute(
+        select(VariantStockShard.id, VariantStockShard.stock)
+        .where(VariantStockShard.variant_id == variant_id)
+        .order_by(VariantStockShard.shard_no)
+        .with_for_update()
+    ).all()
+    if max(pool, 0) + sum(max(shard.stock, 0) for shard in shards) < quantity:
+        return False
+
+    from_pool = min(max(pool, 0), quantity)
+    if from_pool:
+        db.execute(
+            update(ProductVariant)
+            .where(ProductVariant.id == variant_id)
+            .values(stock=ProductVariant.stock - from_pool, sold=ProductVariant.sold + from_pool)
+            .execution_options(synchronize_session=False)
+        )
+    remaining, taken = quantity - from_pool, {}
+    for shard in shards:
+        if not remaining:
+            break
+        if shard.stock > 0:
+            taken[shard.id] = min(shard.stock, remaining)
+            remaining -= taken[shard.id]
+    if taken:
+        q = values(column("shard_id", Integer), column("quantity", Integer), name="q").data(list(taken.items()))
+        db.execute(
+            update(VariantStockShard)
+            .where(VariantStockShard.id == q.c.shard_id)
+            .values(stock=VariantStockShard.stock - q.c.quantity, sold=VariantStockShard.sold + q.c.quantity)
+            .execution_options(synchronize_session=False)
+        )
+    return True
+
+
+def reserve_stock(db: Session, quantities: dict, sharded=frozenset()) -> list:
+    """Take ``{variant_id: quantity}`` out of stock, all or nothing.
+
+    ``sharded`` are the variant ids with stock_sharded set. Returns the
+    variant ids that did not have enough stock, in which case nothing should
+    be committed: the caller rolls back.
+    """
+    plain = {variant_id: quantity for variant_id, quantity in quantities.items() if variant_id not in sharded}
+    if plain:
+        # Lock in id order so that overlapping carts queue instead of deadlocking
+        db.execute(
+            select(ProductVariant.id).where(ProductVariant.id.in_(plain)).order_by(ProductVariant.id)
+            .with_for_update(key_share=True)
+        ).all()
+        q = _quantities(plain)
+        reserved = set(db.scalars(
+            update(ProductVariant)
+            .where(ProductVariant.id == q.c.variant_id, ProductVariant.stock >= q.c.quantity)
+            .values(stock=ProductVariant.stock - q.c.quantity, sold=ProductVariant.sold + q.c.quantity)
+            .returning(ProductVariant.id)
+            .execution_options(synchronize_session=False)
+        ))
+        short = sorted(plain.keys() - reserved)
+        if short:
+            return short
+
+    for variant_id in sorted(quantities.keys() - plain.keys()):
+        if not _reserve_sharded(db, variant_id, quantities[variant_id]):
+            return [variant_id]
+    return []
+
+
+def release_stock(db: Session, quantities: dict):
+    """Put ``{variant_id: quantity}`` back, e.g. when an order is cancelled.
+
+    Sharded variants get it back in the pool, for the rebalancer to spread.
+    The units come off the variant's units sold.
+    """
+    if not quantities:
+        return
+    q = _quantities(quantities)
+    db.execute(
+        update(ProductVariant)
+        .where(ProductVariant.id == q.c.variant_id)
+        .values(stock=ProductVariant.stock + q.c.quantity, sold=ProductVariant.sold - q.c.quantity)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def restock_order(db: Session, order):
+    """Return a cancelled order's items to stock and take them off units sold.
+
+    The caller holds the order row locked and has checked it was not
+    already cancelled, so the stock goes back once.
+    """
+    stock_returned = {}
+    for item in order.order_items:
+        stock_returned[item.variant_id] = stock_returned.get(item.variant_id, 0) + item.quantity
+    release_stock(db, stock_returned)
+
+
+def fold_sales(db: Session) -> int:
+    """Add the units sold counted on variants to products.units_sold.
+
+    Runs in the caller's transaction; returns how many variants had any.
+    """
+    pending = db.execute(
+        select(ProductVariant.id, ProductVariant.product_id, ProductVariant.sold).where(ProductVariant.sold != 0)
+    ).all()
+    if not pending:
+        return 0
+    sales = {}
+    for _, product_id, sold in pending:
+        sales[product_id] = sales.get(product_id, 0) + sold
+    # Products first, as admin edits do; then the variants in id order, as
+    # checkouts do. Checkouts since the read above keep their units.
+    record_sales(db, sales)
+    db.execute(
+        select(ProductVariant.id).where(ProductVariant.id.in_([row.id for row in pending])).order_by(ProductVariant.id)
+        .with_for_update(key_share=True)
+    ).all()
+    q = _quantities({row.id: row.sold for row in pending})
+    db.execute(
+        update(ProductVariant)
+        .where(ProductVariant.id == q.c.variant_id)
+        .values(sold=ProductVariant.sold - q.c.quantity)
+        .execution_options(synchronize_session=False)
+    )
+    return len(pending)
+
+
+def reset_shards(db: Session, variant_ids):
+    """Call after setting ``stock`` outright: the new value is the whole stock.
+
+    Empties the buckets of the sharded ones among ``variant_ids``; the
+    rebalancer spreads the pool over them again.
+    """
+    if variant_ids:
+        db.execute(
+            update(VariantStockShard)
+            .where(VariantStockShard.variant_id.in_(list(variant_ids)))
+            .values(stock=0)
+        )
+
+
+def rebalance(db: Session, variant_id: int):
+    """Spread pool and buckets evenly over the buckets; fold in units sold.
+
+    Runs in the caller's transaction; holds the variant's locks until commit.
+    """
+    variant = db.query(ProductVariant).filter(ProductVariant.id == variant_id).with_for_update(key_share=True).one()
+    shards = (
+        db.query(VariantStockShard)
+        .filter(VariantStockShard.variant_id == variant_id)
+        .order_by(VariantStockShard.shard_no)
+        .with_for_update()
+        .all()
+    )
+    if not shards:
+        return
+    total = variant.stock + sum(shard.stock for shard in shards)
+    record_sales(db, {variant.product_id: sum(shard.sold for shard in shards)})
+    base, extra = divmod(max(total, 0), len(shards))
+    for index, shard in enumerate(shards):
+        shard.stock = base + (1 if index < extra else 0)
+        shard.sold = 0
+    variant.stock = min(total, 0)
+
+
+def configure_shards(db: Session, variant_id: int, shards: int):
+    """Shard a variant's stock over ``shards`` buckets; 0 turns sharding off."""
+    if not 0 <= shards <= MAX_STOCK_SHARDS:
+        raise ValueError(f"shards must be between 0 and {MAX_STOCK_SHARDS}")
+    variant = db.query(ProductVariant).filter(ProductVariant.id == variant_id).with_for_update(key_share=True).one()
+    existing = (
+        db.query(VariantStockShard)
+        .filter(VariantStockShard.variant_id == variant_id)
+        .order_by(VariantStockShard.shard_no)
+        .with_for_update()
+        .all()
+    )
+    # Buckets that go away return their stock to the pool
+    dropped = existing[shards:]
+    if dropped:
+        variant.stock += sum(shard.stock for shard in dropped)
+        record_sales(db, {variant.product_id: sum(shard.sold for shard in dropped)})
+        db.execute(delete(VariantStockShard).where(VariantStockShard.id.in_([shard.id for shard in dropped])))
+    if shards > len(existing):
+        db.execute(insert(VariantStockShard), [
+            {"variant_id": variant_id, "shard_no": shard_no} for shard_no in range(len(existing), shards)
+        ])
+    variant.stock_sharded = shards > 0
+    db.flush()
+    if shards:
+        rebalance(db, variant_id)
+
+
+def rebalance_all(db: Session) -> int:
+    """Rebalance every sharded variant that needs it; returns how many did."""
+    candidates = db.execute(
+        select(
+            VariantStockShard.variant_id,
+            func.min(ProductVariant.stock),
+            func.sum(VariantStockShard.stock),
+            func.min(VariantStockShard.stock),
+            func.count(),
+            func.sum(VariantStockShard.sold),
+        )
+        .join(ProductVariant, ProductVariant.id == VariantStockShard.variant_id)
+        .where(ProductVariant.stock_sharded)
+        .group_by(VariantStockShard.variant_id)
+    ).all()
+    db.rollback()
+    rebalanced = 0
+    for variant_id, pool, total, lowest, count, sold in candidates:
+        # Pool to hand out, sales to record, or a bucket under half its share
+        if pool or sold or lowest * 2 < (pool + total) // count:
+            rebalance(db, variant_id)
+            db.commit()
+            rebalanced += 1
+    return rebalanced
+
+
+def _rebalancer():
+    while True:
+        db = SessionLocal()
+        try:
+            fold_sales(db)
+            db.commit()
+            rebalance_all(db)
+        except Exception:
+            logger.exception("Stock rebalance failed")
+            db.rollback()
+        finally:
+            db.close()
+        _stop.wait(REBALANCE_INTERVAL)
+
+
+_stop = threading.Event()
+_rebalancer_thread = None
+
+
+def start_rebalancer():
+    global _rebalancer_thread
+    if _rebalancer_thread is None:
+        _rebalancer_thread = threading.Thread(target=_rebalancer, name="stock-rebalancer", daemon=True)
+        _rebalancer_thread.start()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Shard a variant's stock, or rebalance sharded variants and record sales")
+    parser.add_argument("--variant", type=int, help="variant id to (re)shard")
+    parser.add_argument("--shards", type=int, help="number of buckets; 0 turns sharding off")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.variant is not None:
+            configure_shards(db, args.variant, args.shards or 0)
+            db.commit()
+            print(f"variant {args.variant}: {args.shards or 0} stock shards")
+        else:
+            folded = fold_sales(db)
+            db.commit()
+            print(f"folded the sales of {folded} variants, rebalanced {rebalance_all(db)} variants")
+    finally:
+        db.close()
@@ -0,0 +1,160 @@
+import argparse, asyncio, hashlib, os, tempfile, time
+from fastapi import UploadFile
+from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from app.database import SessionLocal
+from app.models import ProductImage
+
+CONTENT_DIR = "media/content"
+CONTENT_URL = "/media/content"
+CHUNK_SIZE = 1024 * 1024
+# Unreferenced files younger than this are kept: an upload that is still
+# being saved may already point at them
+ORPHAN_GRACE = 600  # seconds
+os.makedirs(CONTENT_DIR, exist_ok=True)
+
+
+# Content-addressed image storage. Files are named by the SHA-256 of their
+# bytes, computed while the upload is copied in CHUNK_SIZE pieces into a
+# temporary file, and stored as media/content/<hash[:2]>/<hash><ext>.
+# Identical uploads share one file and one URL. A file is referenced by the
+# product_images rows carrying its URL and is deleted when the last one goes.
+# Writes are atomic (temp file + rename), run in the thread pool, and the
+# files of one request are written concurrently. Derivatives (app/images.py)
+# sit next to their original as <hash>-<size>.<format> and go with it.
+
+def content_path(url: str) -> str | None:
+    if not url.startswith(CONTENT_URL + "/"):
+        return None
+    return os.path.join(CONTENT_DIR, url[len(CONTENT_URL) + 1:])
+
+
+def store_file(src, original_name: str) -> str:
+    """Store the binary file object ``src``; return its content URL."""
+    ext = os.path.splitext(original_name)[1].lower()
+    digest = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=CONTENT_DIR, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := src.read(CHUNK_SIZE):
+                digest.update(chunk)
+                out.write(chunk)
+        name = digest.hexdigest() + ext
+        url = f"{CONTENT_URL}/{name[:2]}/{name}"
+        path = content_path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            os.unlink(tmp_path)
+            os.utime(path)  # restart the orphan grace period
+        else:
+            os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return url
+
+
+def _store_upload(upload: UploadFile) -> str:
+    upload.file.seek(0)
+    return store_file(upload.file, upload.filename)
+
+
+async def save_uploads(uploads: list[UploadFile]) -> list[str]:
+    """Write uploads concurrently off the event loop; URLs come back in order."""
+    return list(await asyncio.gather(*[run_in_threadpool(_store_upload, upload) for upload in uploads]))
+
+
+def _referenced(db: Session, urls) -> set:
+    return {url for (url,) in db.query(ProductImage.image_url).filter(ProductImage.image_url.in_(list(urls)))}
+
+
+def release_files(db: Session, urls):
+    """Delete content files that no product image references any more.
+
+    Call after the transaction that removed the references has committed.
+    """
+    urls = {url for url in urls if content_path(url)}
+    if not urls:
+        return
+    cutoff = time.time() - ORPHAN_GRACE
+    for url in urls - _referenced(db, urls):
+        path = content_path(url)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                _remove_derivatives(path)
+        except FileNotFoundError:
+            pass
+
+
+def _remove_derivatives(path: str):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    directory = os.path.dirname(path)
+    for name in os.listdir(directory):
+        if name.startswith(stem + "-"):
+            os.remove(os.path.join(directory, name))
+
+
+def collect_garbage(db: Session, batch_size: int = 1000) -> int:
+    """Sweep unreferenced files and stale temp files; returns files removed."""
+    cutoff = time.time() - ORPHAN_GRACE
+    removed = 0
+    candidates = {}
+    for root, _, files in os.walk(CONTENT_DIR):
+        for name in files:
+            path = os.path.join(root, name)
+            if os.path.getmtime(path) >= cutoff:
+                continue
+            if name.startswith(".tmp-"):
+                os.remove(path)
+                removed += 1
+                continue
+            if "-" in name:
+                continue  # derivative, removed with its original
+            candidates[f"{CONTENT_URL}/{os.path.relpath(path, CONTENT_DIR)}"] = path
+            if len(candidates) >= batch_size:
+                removed += _remove_unreferenced(db, candidates)
+                candidates = {}
+    removed += _remove_unreferenced(db, candidates)
+
+    # Derivatives whose original is gone
+    for root, _, files in os.walk(CONTENT_DIR):
+        originals = {os.path.splitext(name)[0] for name in files if "-" not in name}
+        for name in files:
+            if "-" in name and not name.startswith(".tmp-") and name.split("-", 1)[0] not in originals:
+                os.remove(os.path.join(root, name))
+                removed += 1
+    return removed
+
+
+def _remove_unreferenced(db: Session, candidates: dict) -> int:
+    if not candidates:
+        return 0
+    orphans = set(candidates) - _referenced(db, candidates)
+    for url in orphans:
+        os.remove(candidates[url])
+        _remove_derivatives(candidates[url])
+    return len(orphans)
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """Static files whose names change with their content."""
+
+    async def get_response(self, path: str, scope):
+        response = await super().get_response(path, scope)
+        if response.status_code in (200, 304):
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        return response
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Remove media files no product image references")
+    parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        print(f"removed {collect_garbage(db)} files")
+    finally:
+        db.close()
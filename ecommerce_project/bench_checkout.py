@@ -0,0 +1,135 @@
+import argparse
+import os
+import statistics
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+# Checkout latency benchmark: POSTs orders with carts of 1, 10 and 100 lines
+# against a running server and prints latency percentiles per cart size.
+#
+#   python bench_checkout.py --username admin --password secret --variants 1-200
+#
+# Contention mode fires parallel single-unit checkouts at one variant and
+# counts the outcomes; with stock S there must be exactly S orders (201) and
+# the rest 409, never a 500 (deadlock) or a negative stock:
+#
+#   python bench_checkout.py --username admin --password secret --contention 7 --requests 500
+#
+# With --shards (admin credentials) the variant is restocked to --stock and
+# re-sharded before each round, showing how throughput scales with buckets:
+#
+#   python bench_checkout.py --username admin --password secret --contention 7 \
+#       --requests 2000 --concurrency 64 --stock 100000 --shards 0 4 16
+
+BASE_URL = os.getenv("BENCH_URL", "http://localhost:8000")
+
+
+def login(session, username, password):
+    response = session.post(f"{BASE_URL}/login/", json={"username": username, "password": password})
+    response.raise_for_status()
+    session.headers["Authorization"] = f"Bearer {response.json()['access_token']}"
+
+
+def cart(variant_ids, lines, offset):
+    return {
+        "order_status": "pending",
+        "order_items": [
+            # product_id is taken from the variant by the server
+            {"product_id": 0, "variant_id": variant_ids[(offset + i) % len(variant_ids)], "quantity": 1}
+            for i in range(lines)
+        ],
+    }
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def run(session, variant_ids, lines, runs):
+    latencies = []
+    for run_index in range(runs):
+        payload = cart(variant_ids, lines, run_index * lines)
+        started = time.perf_counter()
+        response = session.post(f"{BASE_URL}/orders/", json=payload)
+        latencies.append((time.perf_counter() - started) * 1000)
+        if response.status_code != 201:
+            raise SystemExit(f"{lines} lines: HTTP {response.status_code} {response.text}")
+    return latencies
+
+
+def contention(username, password, variant_id, requests_count, concurrency):
+    def checkout(_):
+        session = sessions.pop()
+        try:
+            started = time.perf_counter()
+            response = session.post(f"{BASE_URL}/orders/", json=cart([variant_id], 1, 0))
+            return response.status_code, (time.perf_counter() - started) * 1000
+        finally:
+            sessions.append(session)
+
+    sessions = []
+    for _ in range(concurrency):
+        session = requests.Session()
+        login(session, username, password)
+        sessions.append(session)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(checkout, range(requests_count)))
+    elapsed = time.perf_counter() - started
+
+    statuses = Counter(status_code for status_code, _ in results)
+    latencies = [latency for _, latency in results]
+    print(f"variant {variant_id}: {requests_count} checkouts, {concurrency} in parallel")
+    for status_code, count in sorted(statuses.items()):
+        print(f"  HTTP {status_code}: {count}")
+    print(f"  p50 {percentile(latencies, 50):.1f} ms, p99 {percentile(latencies, 99):.1f} ms, "
+          f"{statuses[201] / elapsed:.0f} orders/s")
+
+
+def prepare(session, variant_id, stock, shards):
+    response = session.post(f"{BASE_URL}/admin/variants/bulk-update", json=[{"variant_id": variant_id, "stock": stock}])
+    response.raise_for_status()
+    response = session.put(f"{BASE_URL}/admin/variants/{variant_id}/stock-shards", json={"shards": shards})
+    response.raise_for_status()
+    print(f"shards={shards}: stock {response.json()['available_stock']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark POST /orders/")
+    parser.add_argument("--username", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--variants", default="1-100", help="variant id range to order from, e.g. 1-500")
+    parser.add_argument("--lines", type=int, nargs="+", default=[1, 10, 100], help="cart sizes")
+    parser.add_argument("--runs", type=int, default=50, help="orders per cart size")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--contention", type=int, metavar="VARIANT_ID", help="hammer one variant instead")
+    parser.add_argument("--requests", type=int, default=300, help="checkouts in contention mode")
+    parser.add_argument("--concurrency", type=int, default=50, help="parallel clients in contention mode")
+    parser.add_argument("--shards", type=int, nargs="+", help="stock shard counts to compare in contention mode")
+    parser.add_argument("--stock", type=int, default=100000, help="stock to reset to before each shard round")
+    args = parser.parse_args()
+
+    if args.contention is not None:
+        admin = requests.Session()
+        login(admin, args.username, args.password)
+        for shards in args.shards or [None]:
+            if shards is not None:
+                prepare(admin, args.contention, args.stock, shards)
+            contention(args.username, args.password, args.contention, args.requests, args.concurrency)
+        raise SystemExit
+
+    first, last = (int(part) for part in args.variants.split("-"))
+    variant_ids = list(range(first, last + 1))
+
+    session = requests.Session()
+    login(session, args.username, args.password)
+    print(f"{'lines':>6} {'runs':>5} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for lines in args.lines:
+        run(session, variant_ids, lines, args.warmup)
+        latencies = run(session, variant_ids, lines, args.runs)
+        print(f"{lines:>6} {args.runs:>5} {statistics.mean(latencies):>9.1f} {percentile(latencies, 50):>9.1f} "
+              f"{percentile(latencies, 95):>9.1f} {percentile(latencies, 99):>9.1f}")
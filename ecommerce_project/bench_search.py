@@ -0,0 +1,165 @@
+import argparse
+import os
+import statistics
+import time
+
+import requests
+from sqlalchemy import text
+
+# Search latency benchmark for GET /products/search.
+#
+# Seed a synthetic catalog first (rows are added to the configured
+# database, in a "Benchmark" category, with skus prefixed "bench-"):
+#
+#   python bench_search.py --seed 1000000
+#
+# then time queries of different selectivity, first pages and pages deep
+# into the results, against a running server:
+#
+#   python bench_search.py --runs 200
+#
+#   python bench_search.py --cleanup
+
+BASE_URL = os.getenv("BENCH_URL", "http://localhost:8000")
+SEED_BATCH = 50000
+
+ADJECTIVES = [
+    "classic", "slim", "rugged", "compact", "deluxe", "vintage", "wireless", "organic", "premium", "portable",
+    "heavy", "light", "smart", "waterproof", "foldable", "ergonomic", "quiet", "bright", "soft", "steel",
+]
+NOUNS = [
+    "shirt", "jacket", "backpack", "kettle", "lamp", "headphones", "keyboard", "blender", "tent", "sneakers",
+    "watch", "wallet", "mug", "speaker", "charger", "drill", "sofa", "helmet", "bottle", "camera",
+    "monitor", "router", "scarf", "boots", "pillow", "grill", "mixer", "tripod", "jeans", "umbrella",
+]
+BRANDS = ["Acme", "Globex", "Initech", "Umbrella", "Hooli", "Vandelay", "Stark", "Wayne", "Tyrell", "Cyberdyne"]
+FEATURES = [
+    "stainless", "bamboo", "leather", "cotton", "carbon", "bluetooth", "usb", "ceramic", "titanium", "merino",
+    "recycled", "handmade", "cordless", "insulated", "adjustable", "magnetic", "breathable", "solar", "matte", "glass",
+]
+
+# (label, query): from a few thousand matches down to a handful
+QUERIES = [
+    ("one noun", "kettle"),
+    ("brand", "initech"),
+    ("two words", "wireless headphones"),
+    ("phrase", '"waterproof boots"'),
+    ("three words", "merino cotton scarf"),
+    ("or", "tent or tripod"),
+    ("negation", "camera -tripod"),
+    ("rare", "titanium solar helmet"),
+]
+
+
+def sql_array(words):
+    return "ARRAY[%s]" % ", ".join(f"'{word}'" for word in words)
+
+
+def seed(count):
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        category_id = db.execute(text("SELECT id FROM categories WHERE category_name = 'Benchmark'")).scalar()
+        if category_id is None:
+            category_id = db.execute(
+                text("INSERT INTO categories (category_name) VALUES ('Benchmark') RETURNING id")
+            ).scalar()
+        start = db.execute(text("SELECT count(*) FROM products WHERE sku LIKE 'bench-%'")).scalar()
+        db.commit()
+
+        adjectives, nouns, brands, features = (sql_array(words) for words in (ADJECTIVES, NOUNS, BRANDS, FEATURES))
+        started = time.perf_counter()
+        for first in range(start, start + count, SEED_BATCH):
+            last = min(first + SEED_BATCH, start + count) - 1
+            # The search_vector trigger fills in the document for every row
+            db.execute(text(f"""
+                INSERT INTO products (sku, product_name, brand, description, category_id, is_feature)
+                SELECT 'bench-' || g,
+                       ({adjectives})[1 + g % {len(ADJECTIVES)}] || ' ' || ({nouns})[1 + (g / 7) % {len(NOUNS)}],
+                       ({brands})[1 + (g / 3) % {len(BRANDS)}],
+                       'Made of ' || ({features})[1 + (g / 11) % {len(FEATURES)}] || ' and '
+                           || ({features})[1 + (g / 13) % {len(FEATURES)}] || ', a ' || md5(g::text) || ' edition',
+                       :category_id, false
+                FROM generate_series(:first, :last) g
+            """), {"category_id": category_id, "first": first, "last": last})
+            db.commit()
+            print(f"seeded {last - start + 1}/{count} products ({time.perf_counter() - started:.0f}s)")
+        db.execute(text("ANALYZE products"))
+        db.commit()
+    finally:
+        db.close()
+
+
+def cleanup():
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        deleted = db.execute(text("DELETE FROM products WHERE sku LIKE 'bench-%'")).rowcount
+        db.execute(text("DELETE FROM categories WHERE category_name = 'Benchmark'"))
+        db.commit()
+        print(f"deleted {deleted} products")
+    finally:
+        db.close()
+
+
+def percentile(samples, pct):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * pct / 100))]
+
+
+def search(session, q, limit, cursor=None):
+    params = {"q": q, "limit": limit, "view": "card"}
+    if cursor:
+        params["cursor"] = cursor
+    started = time.perf_counter()
+    response = session.get(f"{BASE_URL}/products/search", params=params)
+    elapsed = (time.perf_counter() - started) * 1000
+    if response.status_code != 200:
+        raise SystemExit(f"{q!r}: HTTP {response.status_code} {response.text}")
+    return elapsed, response.json()["next_cursor"]
+
+
+def run(session, q, limit, depth, runs, warmup):
+    # The cursor of page ``depth``, then time fetching the page after it
+    cursor = None
+    for _ in range(depth):
+        _, cursor = search(session, q, limit, cursor)
+        if cursor is None:
+            return None
+    for _ in range(warmup):
+        search(session, q, limit, cursor)
+    return [search(session, q, limit, cursor)[0] for _ in range(runs)]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark GET /products/search")
+    parser.add_argument("--seed", type=int, metavar="COUNT", help="add COUNT synthetic products and exit")
+    parser.add_argument("--cleanup", action="store_true", help="delete the synthetic products and exit")
+    parser.add_argument("--runs", type=int, default=100, help="requests per query and page")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--limit", type=int, default=20, help="page size")
+    parser.add_argument("--depths", type=int, nargs="+", default=[0, 50], help="pages to skip before timing")
+    args = parser.parse_args()
+
+    if args.seed:
+        seed(args.seed)
+        raise SystemExit
+    if args.cleanup:
+        cleanup()
+        raise SystemExit
+
+    session = requests.Session()
+    print(f"{'query':<14} {'page':>5} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    worst = 0
+    for label, q in QUERIES:
+        for depth in args.depths:
+            latencies = run(session, q, args.limit, depth, args.runs, args.warmup)
+            if latencies is None:
+                print(f"{label:<14} {depth:>5}  fewer results than that")
+                continue
+            worst = max(worst, percentile(latencies, 99))
+            print(f"{label:<14} {depth:>5} {statistics.mean(latencies):>9.1f} {percentile(latencies, 50):>9.1f} "
+                  f"{percentile(latencies, 95):>9.1f} {percentile(latencies, 99):>9.1f}")
+    print(f"worst p99: {worst:.1f} ms")
@@ -0,0 +1,33 @@
+import pytest
+
+
+@pytest.fixture
+def variant(make_product):
+    return make_product(variants=[{"sku": "v1", "price": 10, "stock": 5, "discount": 0}]).variants[0]
+
+
+@pytest.mark.parametrize("price", ["nan", "inf", "-inf", "Infinity"])
+def test_non_finite_price_is_rejected(db, client, variant, price):
+    response = client.post("/admin/variants/bulk-update", content=f"sku,price\nv1,{price}\n",
+                           headers={"content-type": "text/csv"})
+    assert response.status_code == 200, response.text
+    [outcome] = response.json()["results"]
+    assert outcome["status"] == "invalid"
+    db.refresh(variant)
+    assert variant.price == 10
+
+
+def test_json_nan_and_huge_stock_are_rejected(db, client, variant):
+    body = '[{"sku": "v1", "price": NaN}, {"sku": "v1", "stock": 1e400}]'
+    response = client.post("/admin/variants/bulk-update", content=body, headers={"content-type": "application/json"})
+    assert response.status_code == 200, response.text
+    assert [outcome["status"] for outcome in response.json()["results"]] == ["invalid", "invalid"]
+
+
+def test_csv_quoted_field_may_contain_newlines(db, client, variant):
+    body = 'sku,note,price\r\nv1,"two\nlines, and a comma",12.5\r\n\r\n'
+    response = client.post("/admin/variants/bulk-update", content=body, headers={"content-type": "text/csv"})
+    assert response.status_code == 200, response.text
+    assert [outcome["status"] for outcome in response.json()["results"]] == ["updated"]
+    db.refresh(variant)
+    assert variant.price == 12.5
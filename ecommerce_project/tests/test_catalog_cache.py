@@ -0,0 +1,48 @@
+from sqlalchemy import text
+
+
+def test_cached_body_follows_writes_from_other_workers(client, engine, make_product):
+    product = make_product(product_name="Before", variants=[])
+
+    first = client.get(f"/products/{product.id}")
+    assert first.json()["product_name"] == "Before"
+
+    # Another worker's write: the database changes, this process's cache is not invalidated
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE products SET product_name = 'After', version = version + 1 WHERE id = :id"),
+                     {"id": product.id})
+
+    second = client.get(f"/products/{product.id}")
+    assert second.headers["etag"] != first.headers["etag"]
+    assert second.json()["product_name"] == "After"
+
+
+def test_checkout_and_cancel_change_the_etag(client, make_product):
+    product = make_product()
+    variant_id = product.variants[0].id
+    urls = [f"/products/{product.id}", f"/products/category/{product.category_id}"]
+    before = {url: client.get(url).headers["etag"] for url in urls}
+
+    order = client.post("/orders/", json={"order_status": "pending", "order_items": [
+        {"product_id": 0, "variant_id": variant_id, "quantity": 3}]})
+    assert order.status_code == 201, order.text
+    for url in urls:
+        response = client.get(url, headers={"If-None-Match": before[url]})
+        assert response.status_code == 200
+        assert response.headers["etag"] != before[url]
+    assert client.get(urls[0]).json()["variants"][0]["stock"] == 2
+
+    client.put(f"/orders/cancel/{order.json()['id']}")
+    response = client.get(urls[0])
+    assert response.json()["variants"][0]["stock"] == 5
+    assert response.headers["etag"] == before[urls[0]]
+
+
+def test_featured_etag_hashes_rows_in_id_order(db, client, make_product, statements):
+    product = make_product()
+    product.is_feature = True
+    db.commit()
+    statements.statements.clear()
+    assert client.get("/products/featuredproducts").status_code == 200
+    etag_query = next(statement for statement in statements.statements if "array_agg" in statement)
+    assert etag_query.rstrip().endswith("ORDER BY products.id")
@@ -0,0 +1,96 @@
+import pytest
+
+from app import models
+from app.cache import catalog_cache
+from app.catalog import encode_cursor
+
+
+def add_products(db, admin, category, count, variants, images):
+    for i in range(count):
+        product = models.Product(
+            sku=f"{category.id}-{variants}-{images}-{i}", product_name=f"Product {i}", brand="Acme", description="Test product",
+            category_id=category.id, admin_id=admin.id, is_feature=True, avg_rating=4, review_count=1,
+        )
+        for j in range(variants):
+            variant = models.ProductVariant(price=10 + j, stock=5, attributes={"size": "SML"[j % 3]})
+            variant.images = [models.ProductImage(image_url=f"/media/{i}-{j}-{k}.jpg") for k in range(images)]
+            product.variants.append(variant)
+        db.add(product)
+    db.commit()
+
+
+def count_statements(client, statements, url):
+    # Every request must reach the database, not the serialized-payload cache
+    catalog_cache.clear()
+    statements.statements.clear()
+    response = client.get(url)
+    assert response.status_code == 200, response.text
+    return statements.count
+
+
+@pytest.fixture
+def small_and_large(db, admin):
+    small = models.Category(category_name="small")
+    large = models.Category(category_name="large")
+    db.add_all([small, large])
+    db.commit()
+    add_products(db, admin, small, count=2, variants=1, images=1)
+    add_products(db, admin, large, count=40, variants=6, images=4)
+    return small, large
+
+
+@pytest.mark.parametrize("url", [
+    "/products/category/{category_id}?limit=100",
+    "/products/category/{category_id}?limit=100&view=card",
+    "/products/category/{category_id}?limit=100&legacy=true",
+])
+def test_category_listing_statement_count_is_flat(client, statements, small_and_large, url):
+    small, large = small_and_large
+    assert count_statements(client, statements, url.format(category_id=small.id)) == \
+        count_statements(client, statements, url.format(category_id=large.id))
+
+
+def test_listing_statement_count_is_flat(db, admin, client, statements):
+    category = models.Category(category_name="grows")
+    db.add(category)
+    db.commit()
+    add_products(db, admin, category, count=2, variants=1, images=1)
+    counts = [
+        count_statements(client, statements, "/products/allproducts?limit=100"),
+        count_statements(client, statements, "/products/featuredproducts"),
+        count_statements(client, statements, "/products/rating/by-rating"),
+    ]
+    add_products(db, admin, category, count=40, variants=6, images=4)
+    assert counts == [
+        count_statements(client, statements, "/products/allproducts?limit=100"),
+        count_statements(client, statements, "/products/featuredproducts"),
+        count_statements(client, statements, "/products/rating/by-rating"),
+    ]
+    # products, variants, images, plus the ETag validator
+    assert counts[0] == 4
+
+
+def test_product_detail_statement_count_is_flat(db, admin, client, statements, small_and_large):
+    small, large = small_and_large
+    few = db.query(models.Product.id).filter(models.Product.category_id == small.id).first().id
+    many = db.query(models.Product.id).filter(models.Product.category_id == large.id).first().id
+    assert count_statements(client, statements, f"/products/{few}") == \
+        count_statements(client, statements, f"/products/{many}") == 4
+
+
+@pytest.mark.parametrize("cursor", [
+    encode_cursor("2024-01-01T00:00:00", "not-a-number"),
+    encode_cursor("not-a-date", 1),
+    encode_cursor(1),
+    "!!!",
+])
+def test_invalid_listing_cursor_is_rejected(client, cursor):
+    response = client.get("/products/allproducts", params={"cursor": cursor})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("sort_by", ["price", "rating", "popularity", "newest"])
+@pytest.mark.parametrize("value", ["abc", [1], {"a": 1}, None])
+def test_invalid_sort_cursor_is_rejected(client, sort_by, value):
+    response = client.get("/sort/products", params={"sort_by": sort_by, "cursor": encode_cursor(value, 1)})
+    assert response.status_code == 400
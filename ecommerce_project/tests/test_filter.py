@@ -0,0 +1,13 @@
+from app import models
+
+
+def test_facets_skip_variants_whose_attributes_are_not_an_object(db, client, make_product):
+    db.add(models.VariantAttribute(name="size"))
+    db.commit()
+    make_product(sku="p1", variants=[{"price": 10, "stock": 5, "attributes": {"size": "M"}}])
+    for i, attributes in enumerate([None, ["M"], "M", 3]):
+        make_product(sku=f"bad{i}", variants=[{"price": 10, "stock": 5, "attributes": attributes}])
+
+    response = client.get("/products/filter", params={"view": "card"})
+    assert response.status_code == 200, response.text
+    assert response.json()["facets"] == {"size": {"M": 1}}
@@ -0,0 +1,45 @@
+import io
+
+import pytest
+from PIL import Image
+
+from app import storage
+from app.images import render_derivatives, srcsets
+
+
+@pytest.fixture
+def content_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, "CONTENT_DIR", str(tmp_path))
+    return tmp_path
+
+
+def store_image(width, height):
+    data = io.BytesIO()
+    Image.new("RGB", (width, height), "red").save(data, "PNG")
+    data.seek(0)
+    return storage.store_file(data, "image.png")
+
+
+def test_large_original_gets_every_size(content_dir):
+    derivatives = render_derivatives(store_image(2000, 1000))
+    assert [derivative["width"] for derivative in derivatives.values()] == [160, 480, 1600]
+
+
+def test_small_original_is_not_repeated_per_size(content_dir):
+    derivatives = render_derivatives(store_image(300, 200))
+    # thumb is smaller; card is the original size; zoom would repeat it
+    assert {name: derivative["width"] for name, derivative in derivatives.items()} == {"thumb": 160, "card": 300}
+    assert len(list(content_dir.rglob("*-zoom.*"))) == 0
+
+
+def test_tiny_original_gets_one_size(content_dir):
+    derivatives = render_derivatives(store_image(100, 80))
+    assert {name: derivative["width"] for name, derivative in derivatives.items()} == {"thumb": 100}
+    assert len(srcsets(derivatives)["webp"].split(", ")) == 1
+
+
+def test_srcset_has_one_candidate_per_width():
+    # As stored for small originals before sizes were deduplicated
+    derivatives = {name: {"width": 120, "webp": f"/{name}.webp", "jpeg": f"/{name}.jpg"}
+                   for name in ("thumb", "card", "zoom")}
+    assert srcsets(derivatives)["webp"].count("120w") == 1
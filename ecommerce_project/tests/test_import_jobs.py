@@ -0,0 +1,73 @@
+import csv
+import os
+import time
+
+import pytest
+from sqlalchemy import text
+
+from app import import_jobs, models
+
+
+def write_feed(directory, category_id, rows):
+    os.makedirs(os.path.join(directory, "images"))
+    for name in ("a.jpg", "b.jpg"):
+        with open(os.path.join(directory, "images", name), "wb") as image:
+            image.write(name.encode())
+    with open(os.path.join(directory, "products.csv"), "w", newline="", encoding="utf-8") as feed:
+        writer = csv.writer(feed)
+        writer.writerow(["product_name", "brand", "is_feature", "category_id", "description",
+                         "price", "stock", "attributes", "image_filenames"])
+        for i in range(rows):
+            writer.writerow([f"Product {i}", "Acme", "false", category_id, "d", "9.99", "5", "{}",
+                             "a.jpg,b.jpg" if i % 2 else "a.jpg"])
+
+
+@pytest.fixture
+def job(db, admin, tmp_path, monkeypatch):
+    monkeypatch.setattr(import_jobs, "ERROR_DIR", str(tmp_path))
+    monkeypatch.setattr(import_jobs, "store_file", lambda src, path: f"/media/content/{os.path.basename(path)}")
+    category = models.Category(category_name="feed")
+    db.add(category)
+    db.commit()
+    write_feed(tmp_path / "upload", category.id, 5)
+    job = models.ImportJob(admin_id=admin.id, status=models.ImportJobStatus.running,
+                           upload_dir=str(tmp_path / "upload"), attempts=1)
+    db.add(job)
+    db.commit()
+    return job
+
+
+def test_chunk_derivatives_are_built_in_one_batch(db, job, monkeypatch):
+    batches = []
+
+    def build(urls):
+        batches.append(urls)
+        return [{"thumb": {"width": 160, "webp": f"{url}.webp", "jpeg": f"{url}.jpg"}} for url in urls]
+
+    monkeypatch.setattr(import_jobs, "build_derivatives_sync", build)
+    import_jobs.run_job(db, job)
+    assert job.success_count == 5
+    assert batches == [["/media/content/a.jpg", "/media/content/b.jpg"]]
+    derivatives = {image.image_url: image.derivatives for image in db.query(models.ProductImage)}
+    assert derivatives["/media/content/b.jpg"]["thumb"]["webp"] == "/media/content/b.jpg.webp"
+
+
+def test_heartbeat_is_refreshed_while_a_chunk_runs(db, engine, job, monkeypatch):
+    monkeypatch.setattr(import_jobs, "HEARTBEAT_INTERVAL", 0.05)
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE import_jobs SET heartbeat_at = now() - interval '1 hour' WHERE id = :id"),
+                     {"id": job.id})
+    seen = []
+
+    def slow_build(urls):
+        # Rendering takes a while; the chunk has not committed yet
+        time.sleep(0.5)
+        with engine.connect() as conn:
+            seen.append(conn.execute(text("SELECT now() - heartbeat_at < interval '1 minute' FROM import_jobs "
+                                          "WHERE id = :id"), {"id": job.id}).scalar())
+        return [None] * len(urls)
+
+    monkeypatch.setattr(import_jobs, "build_derivatives_sync", slow_build)
+    import_jobs.run_job(db, job)
+    assert job.status == models.ImportJobStatus.completed
+    assert seen == [True]
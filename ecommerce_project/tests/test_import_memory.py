@@ -0,0 +1,65 @@
+import csv
+import os
+import tracemalloc
+
+import pytest
+
+from app import import_jobs, models
+
+# Rows per import in the small run; the large run imports four times as many.
+# IMPORT_TEST_ROWS=10000000 makes the large feed about 2 GB.
+IMPORT_TEST_ROWS = int(os.getenv("IMPORT_TEST_ROWS", "3000"))
+
+
+def write_feed(directory, prefix, count, category_id):
+    os.makedirs(os.path.join(directory, "images"))
+    with open(os.path.join(directory, "images", "a.jpg"), "wb") as image:
+        image.write(b"not really a jpeg")
+    with open(os.path.join(directory, "products.csv"), "w", newline="", encoding="utf-8") as feed:
+        writer = csv.writer(feed)
+        writer.writerow(["sku", "variant_sku", "product_name", "brand", "is_feature", "category_id", "description",
+                         "price", "stock", "attributes", "image_filenames"])
+        for i in range(count):
+            # Every tenth row is rejected and goes to the error file
+            price = "" if i % 10 == 9 else "9.99"
+            writer.writerow([f"{prefix}-p{i // 2}", f"{prefix}-v{i}", f"Product {i // 2}", "Acme", "false",
+                             category_id, "x" * 80, price, "5", '{"size": "M"}', "a.jpg"])
+
+
+def import_feed(db, admin, directory, prefix, count, category_id):
+    write_feed(directory, prefix, count, category_id)
+    job = models.ImportJob(admin_id=admin.id, status=models.ImportJobStatus.running, upload_dir=str(directory),
+                           attempts=1)
+    db.add(job)
+    db.commit()
+
+    tracemalloc.start()
+    try:
+        import_jobs.run_job(db, job)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    assert job.status == models.ImportJobStatus.completed
+    assert job.rows_processed == count
+    assert job.error_count == count // 10
+    with open(job.error_file, newline="", encoding="utf-8") as errors:
+        assert sum(1 for _ in csv.reader(errors)) == count // 10 + 1
+    return peak
+
+
+def test_import_memory_does_not_grow_with_feed_size(db, admin, tmp_path, monkeypatch):
+    monkeypatch.setattr(import_jobs, "ERROR_DIR", str(tmp_path))
+    monkeypatch.setattr(import_jobs, "save_image", lambda path, product_name, attributes: {
+        "image_url": "/media/content/00/test.jpg",
+    })
+    monkeypatch.setattr(import_jobs, "build_derivatives_sync", lambda urls: [None] * len(urls))
+    category = models.Category(category_name="feed")
+    db.add(category)
+    db.commit()
+
+    # Warm up statement caches and imports, which are not per-row costs
+    import_feed(db, admin, tmp_path / "warmup", "w", 2000, category.id)
+    small = import_feed(db, admin, tmp_path / "small", "s", IMPORT_TEST_ROWS, category.id)
+    large = import_feed(db, admin, tmp_path / "large", "l", IMPORT_TEST_ROWS * 4, category.id)
+    # Anything kept per row (~100 bytes) would add megabytes here
+    assert large - small < 256 * 1024, f"peak {small} bytes for {IMPORT_TEST_ROWS} rows, {large} for 4x"
@@ -0,0 +1,19 @@
+import pytest
+
+from app.importer import parse_row
+
+
+def row(attributes):
+    return {"product_name": "P", "brand": "Acme", "is_feature": "false", "category_id": "1", "description": "d",
+            "price": "9.99", "stock": "5", "attributes": attributes, "image_filenames": "a.jpg"}
+
+
+def test_attributes_object_is_parsed():
+    parsed = parse_row(row('{"size": "M"}'), {1}, {"a.jpg": None}, lambda *args: {})
+    assert parsed["attributes"] == {"size": "M"}
+
+
+@pytest.mark.parametrize("attributes", ['["M"]', '"M"', "3", "null"])
+def test_attributes_must_be_an_object(attributes):
+    with pytest.raises(ValueError, match="attributes must be a JSON object"):
+        parse_row(row(attributes), {1}, {"a.jpg": None}, lambda *args: {})
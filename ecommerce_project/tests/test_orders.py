@@ -0,0 +1,118 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from app import database
+from app.catalog import encode_cursor
+from app.routers.orders import cancel_order
+from app.stock import fold_sales
+
+
+@pytest.fixture
+def variant(make_product):
+    return make_product().variants[0]
+
+
+def order(variant, quantity, **extra):
+    return {"order_status": "pending", **extra,
+            "order_items": [{"product_id": 0, "variant_id": variant.id, "quantity": quantity}]}
+
+
+def test_invalid_coupon_is_rejected_before_stock_is_reserved(db, client, variant, statements):
+    statements.statements.clear()
+    response = client.post("/orders/", json=order(variant, 3, coupon_id=12345))
+    assert response.status_code == 400, response.text
+    assert not [statement for statement in statements.statements if statement.startswith("UPDATE product_variants")]
+    db.refresh(variant)
+    assert variant.stock == 5
+
+
+@pytest.mark.parametrize("order_status", ["cancelled", "delivered", "shipped"])
+def test_new_order_must_be_pending(db, client, variant, order_status):
+    response = client.post("/orders/", json=order(variant, 3, order_status=order_status))
+    assert response.status_code == 400, response.text
+    db.refresh(variant)
+    assert variant.stock == 5
+
+
+def test_parallel_checkouts_of_low_stock_variant_never_oversell(db, make_product, parallel_checkouts):
+    variant = make_product(variants=[{"price": 10, "stock": 40, "discount": 0}]).variants[0]
+    assert parallel_checkouts(variant.id, 200) == {201: 40, 409: 160}
+    db.refresh(variant)
+    assert variant.stock == 0
+
+
+def test_concurrent_cancels_return_stock_once(db, admin, client, variant):
+    response = client.post("/orders/", json=order(variant, 3))
+    assert response.status_code == 201, response.text
+    order_id = response.json()["id"]
+    db.refresh(variant)
+    assert variant.stock == 2
+
+    user = SimpleNamespace(id=admin.id, role="admin")
+    barrier = threading.Barrier(8)
+
+    def cancel():
+        session = database.SessionLocal()
+        try:
+            barrier.wait()
+            cancel_order(order_id, db=session, current_user=user)
+            return 200
+        except HTTPException as e:
+            return e.status_code
+        finally:
+            session.close()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        statuses = sorted(pool.map(lambda _: cancel(), range(8)))
+    assert statuses == [200] + [400] * 7
+    db.refresh(variant)
+    assert variant.stock == 5
+
+
+def test_admin_cancel_returns_stock(db, client, variant):
+    order_id = client.post("/orders/", json=order(variant, 3)).json()["id"]
+    response = client.put(f"/admin/orders/{order_id}", json={"order_status": "cancelled"})
+    assert response.status_code == 200, response.text
+    db.refresh(variant)
+    assert variant.stock == 5
+
+    # Already cancelled: neither path returns the stock again
+    assert client.put(f"/orders/cancel/{order_id}").status_code == 400
+    assert client.put(f"/admin/orders/{order_id}", json={"order_status": "pending"}).status_code == 400
+    db.refresh(variant)
+    assert variant.stock == 5
+
+
+def test_checkout_counts_sales_off_the_product_row(db, client, variant, statements):
+    statements.statements.clear()
+    order_id = client.post("/orders/", json=order(variant, 3)).json()["id"]
+    assert not [statement for statement in statements.statements if statement.startswith("UPDATE products")]
+    db.refresh(variant)
+    assert (variant.sold, variant.product.units_sold) == (3, 0)
+
+    assert fold_sales(db) == 1
+    db.commit()
+    db.refresh(variant)
+    db.refresh(variant.product)
+    assert (variant.sold, variant.product.units_sold) == (0, 3)
+
+    client.put(f"/orders/cancel/{order_id}")
+    fold_sales(db)
+    db.commit()
+    db.refresh(variant.product)
+    assert variant.product.units_sold == 0
+    assert fold_sales(db) == 0
+
+
+@pytest.mark.parametrize("url", ["/orders/", "/admin/orders", "/admin/orders/summary"])
+@pytest.mark.parametrize("cursor", [
+    encode_cursor("2024-01-01T00:00:00", "not-a-number"),
+    encode_cursor("not-a-date", 1),
+    encode_cursor(None, 1),
+])
+def test_invalid_order_cursor_is_rejected(client, url, cursor):
+    assert client.get(url, params={"cursor": cursor}).status_code == 400
@@ -0,0 +1,21 @@
+from sqlalchemy import text
+
+from app import models
+
+
+def test_delete_product_blocked_by_lock_timeout_asks_to_retry(db, client, engine, make_product):
+    product = make_product(variants=[{"price": 10, "stock": 5}])
+    product_id, variant_id = product.id, product.variants[0].id
+
+    # Another transaction holds the variant row, not the product row
+    with engine.connect() as other:
+        other.execute(text("SELECT id FROM product_variants WHERE id = :id FOR UPDATE"), {"id": variant_id})
+        response = client.delete(f"/products/products/{product_id}")
+        other.rollback()
+    assert response.status_code == 409, response.text
+    assert response.headers["retry-after"]
+
+    response = client.delete(f"/products/products/{product_id}")
+    assert response.status_code == 200, response.text
+    db.expire_all()
+    assert db.get(models.Product, product_id) is None
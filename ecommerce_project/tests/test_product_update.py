@@ -0,0 +1,13 @@
+import json
+
+import pytest
+
+
+@pytest.mark.parametrize("attributes", [["red"], "red", 3])
+def test_variant_attributes_must_be_an_object(db, client, make_product, attributes):
+    variant = make_product().variants[0]
+    payload = {"id": variant.id, "price": 10, "stock": 5, "discount": 0, "attributes": attributes}
+    response = client.put(f"/products/products/{variant.product_id}", data={"variants": [json.dumps(payload)]})
+    assert response.status_code == 400, response.text
+    db.refresh(variant)
+    assert variant.attributes == {}
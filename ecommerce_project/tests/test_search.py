@@ -0,0 +1,30 @@
+from app import models
+
+
+def test_search_pages_through_tied_ranks(db, admin, client):
+    category = models.Category(category_name="tools")
+    db.add(category)
+    db.commit()
+    # Same document, same rank: only the id orders them
+    db.add_all([
+        models.Product(sku=f"g{i}", product_name="Gizmo", brand="Acme", description="A gizmo",
+                       category_id=category.id, admin_id=admin.id)
+        for i in range(7)
+    ])
+    db.add(models.Product(sku="other", product_name="Widget", brand="Acme", description="d",
+                          category_id=category.id, admin_id=admin.id))
+    db.commit()
+
+    seen, cursor = [], None
+    for _ in range(10):
+        params = {"q": "gizmo", "limit": 2, "view": "card"}
+        if cursor:
+            params["cursor"] = cursor
+        page = client.get("/products/search", params=params).json()
+        seen += [item["id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert cursor is None
+    assert len(seen) == len(set(seen)) == 7
+    assert seen == sorted(seen, reverse=True)
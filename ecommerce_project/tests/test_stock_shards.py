@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+from app import models
+from app.stock import configure_shards
+
+
+@pytest.fixture
+def sharded_variant(db, make_product):
+    variant = make_product(variants=[{"price": 10, "stock": 10, "discount": 0, "shipping_time": 1}]).variants[0]
+    configure_shards(db, variant.id, 4)
+    db.commit()
+    return variant
+
+
+def edit(client, variant, **changes):
+    payload = {"id": variant.id, "price": 10, "stock": 10, "discount": 0, "shipping_time": 1, **changes}
+    return client.put(f"/products/products/{variant.product_id}", data={"variants": [json.dumps(payload)]})
+
+
+def stock(db, variant):
+    db.expire_all()
+    buckets = [shard.stock for shard in db.query(models.VariantStockShard).filter_by(variant_id=variant.id)]
+    return db.get(models.ProductVariant, variant.id).available_stock, sorted(buckets)
+
+
+def test_price_edit_keeps_sharded_stock(db, client, sharded_variant):
+    assert stock(db, sharded_variant) == (10, [2, 2, 3, 3])
+    response = edit(client, sharded_variant, price=12)
+    assert response.status_code == 200, response.text
+    assert stock(db, sharded_variant) == (10, [2, 2, 3, 3])
+
+
+def test_stock_edit_replaces_sharded_stock(db, client, sharded_variant):
+    response = edit(client, sharded_variant, stock=7)
+    assert response.status_code == 200, response.text
+    assert stock(db, sharded_variant) == (7, [0, 0, 0, 0])
+
+
+def test_order_larger_than_any_bucket_is_split_across_them(db, client, sharded_variant):
+    def checkout(quantity):
+        return client.post("/orders/", json={"order_items": [
+            {"product_id": 0, "variant_id": sharded_variant.id, "quantity": quantity}]})
+
+    response = checkout(4)
+    assert response.status_code == 201, response.text
+    available, buckets = stock(db, sharded_variant)
+    assert available == 6 and sum(buckets) == 6
+    assert sum(shard.sold for shard in db.query(models.VariantStockShard)) == 4
+
+    assert checkout(7).status_code == 409
+    assert checkout(6).status_code == 201
+    assert stock(db, sharded_variant) == (0, [0, 0, 0, 0])
+
+
+@pytest.mark.parametrize("quantity", [1, 3])
+def test_parallel_checkouts_of_sharded_variant_never_oversell(db, make_product, parallel_checkouts, quantity):
+    variant = make_product(variants=[{"price": 10, "stock": 40 * quantity, "discount": 0}]).variants[0]
+    configure_shards(db, variant.id, 7)
+    db.commit()
+    assert parallel_checkouts(variant.id, 200, quantity) == {201: 40, 409: 160}
+    assert stock(db, variant) == (0, [0] * 7)